@@ -20,10 +20,46 @@ __status__ = "Release"
 
 import numpy as np
 import ctypes as c
-
-libFSToolbox = c.CDLL("libFSToolbox.so"); 
-
-def BetaGamma(data, labels, n_select, beta=1.0, gamma=1.0):
+import hashlib
+import io
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+# the functions of libFSToolbox with their prototypes set, by name
+_C_PROTOTYPES = {}
+
+try:
+  libFSToolbox = c.CDLL("libFSToolbox.so")
+except OSError:
+  # FEAST/MIToolbox is not installed, every selector falls back on
+  # the NumPy implementation at the bottom of this module.
+  libFSToolbox = None
+else:
+  # the prototypes are set once here rather than per call, so that
+  # selections can run from several threads at the same time and a
+  # call only has to pass plain numbers.  Every function writes the
+  # selected features into its output array, and the pointer it also
+  # returns is not needed.
+  for _name in ("BetaGamma", "CMIM", "CondMI", "DISR", "ICAP", "JMI", "MIM", "mRMR_D"):
+    try:
+      _function = getattr(libFSToolbox, _name)
+    except AttributeError:
+      # an older build without this function, whose selector fails
+      # only when it is called
+      continue
+    _function.argtypes = [c.c_int, c.c_int, c.c_int, c.c_void_p, c.c_void_p, c.c_void_p]
+    if _name == "BetaGamma":
+      _function.argtypes += [c.c_double, c.c_double]
+    _function.restype = None
+    _C_PROTOTYPES[_name] = _function
+
+def BetaGamma(data, labels, n_select, beta=1.0, gamma=1.0, backend=None, cache=None, n_jobs=1,
+              resume_from=None, stop=None, callback=None, store=None, tolerance=None,
+              n_bins=None, binning=None):
   """
     This algorithm implements conditional mutual information 
     feature select, such that beta and gamma control the 
@@ -33,7 +69,7 @@ def BetaGamma(data, labels, n_select, beta=1.0, gamma=1.0):
       @param data: data in a Numpy array such that len(data) = 
         n_observations, and len(data.transpose()) = n_features
         (REQUIRED)
-      @type data: ndarray
+      @type data: ndarray or DiscretizedDataset
       @param labels: labels represented in a numpy list with 
         n_observations as the number of elements. That is 
         len(labels) = len(data) = n_observations.
@@ -46,59 +82,132 @@ def BetaGamma(data, labels, n_select, beta=1.0, gamma=1.0):
       @param gamma: positive weight attached to the conditional
         redundancy term I(X_k;X_j|Y)
       @type gamma: float between 0 and 1.0 
+      @param backend: "c" for libFSToolbox, "numpy" for the vectorized
+          NumPy implementation, or None to use libFSToolbox whenever
+          it could be loaded and data is not integer typed.
+      @type backend: string
+      @param cache: an L{MICache} built from data and labels, implies
+          the NumPy backend.
+      @type cache: MICache
+      @param n_jobs: number of threads scoring the candidate features at
+          each step, -1 for one per CPU.  Implies the NumPy backend when
+          not 1.  The selection does not depend on it.
+      @type n_jobs: integer
+      @param resume_from: a selection returned by an earlier call with
+          the same data and parameters.  Only the steps past it are run.
+      @type resume_from: Selection
+      @param stop: ends the search before n_select features when the
+          criterion stops improving enough or time runs out.  Implies
+          the NumPy backend.
+      @type stop: EarlyStop
+      @param callback: called with a dict describing each step as it is
+          taken: its "step", the "feature" selected, its "score", the
+          seconds "elapsed" since the search started and the number of
+          "evaluations" so far.  Returning False stops the search
+          there.  Implies the NumPy backend.
+      @type callback: callable
+      @param store: a L{ResultStore} to look the selection up in before
+          running it, and to keep it in afterwards.
+      @type store: ResultStore
+      @param tolerance: score the candidates on growing random subsets
+          of the observations, dropping those clearly behind, and count
+          every observation only for the last contenders.  The chance at
+          each step of missing the feature the exact search selects, such
+          as 0.05, or None to search exactly.  Implies the NumPy backend.
+      @type tolerance: float
+      @param n_bins: discretize the data first into this many bins per
+          feature, see L{discretize}.
+      @type n_bins: integer
+      @param binning: "width" or "frequency" to discretize the data first
+          into bins of equal width or holding as many observations, or the
+          edges of the bins, see L{discretize}.
+      @type binning: string or ndarray
       @return: features in the order they were selected. 
       @rtype: list
   """
-  data, labels = check_data(data, labels)
-
-  # python values
-  n_observations, n_features = data.shape
-  output = np.zeros(n_select)
-
-  # cast as C types
-  c_n_observations = c.c_int(n_observations)
-  c_n_select = c.c_int(n_select)
-  c_n_features = c.c_int(n_features)
-  c_beta = c.c_double(beta)
-  c_gamma = c.c_double(gamma)
-
-  libFSToolbox.BetaGamma.restype = c.POINTER(c.c_double * n_select)
-  features = libFSToolbox.BetaGamma(c_n_select,
-                   c_n_observations,
-                   c_n_features, 
-                   data.ctypes.data_as(c.POINTER(c.c_double)),
-                   labels.ctypes.data_as(c.POINTER(c.c_double)),
-                   output.ctypes.data_as(c.POINTER(c.c_double)),
-                   c_beta,
-                   c_gamma
-                   )
-
-  selected_features = []
-  for i in features.contents:
-    selected_features.append(i)
-  return selected_features
-
-
-def CIFE(data, labels, n_select):
+  if n_bins is not None or binning is not None:
+    data = discretize(data, n_bins, binning)
+  if store is not None:
+    return store.select(BetaGamma, data, labels, n_select, beta=beta, gamma=gamma,
+                        backend=backend, cache=cache, n_jobs=n_jobs,
+                        resume_from=resume_from, stop=stop, callback=callback,
+                        tolerance=tolerance)
+  if _use_numpy(backend, data, labels, cache=cache, n_jobs=n_jobs, resume_from=resume_from,
+                stop=stop, callback=callback, tolerance=tolerance):
+    return _numpy_select("BetaGamma", data, labels, n_select, beta, gamma, cache=cache,
+                         n_jobs=n_jobs, resume_from=resume_from, stop=stop,
+                         callback=callback, tolerance=tolerance)
+
+  return _c_select("BetaGamma", data, labels, n_select, beta, gamma)
+
+
+def CIFE(data, labels, n_select, backend=None, cache=None, n_jobs=1,
+         resume_from=None, stop=None, callback=None, store=None, tolerance=None,
+         n_bins=None, binning=None):
   """
     This function implements the Condred feature selection algorithm.
     beta = 1; gamma = 1;
 
     @param data: A Numpy array such that len(data) = 
         n_observations, and len(data.transpose()) = n_features
-    @type data: ndarray
+    @type data: ndarray or DiscretizedDataset
     @param labels: labels represented in a numpy list with 
         n_observations as the number of elements. That is 
         len(labels) = len(data) = n_observations.
     @type labels: ndarray
     @param n_select:  number of features to select.
     @type n_select: integer
+    @param backend: "c" for libFSToolbox, "numpy" for the vectorized
+        NumPy implementation, or None to use libFSToolbox whenever
+        it could be loaded and data is not integer typed.
+    @type backend: string
+    @param cache: an L{MICache} built from data and labels, implies
+        the NumPy backend.
+    @type cache: MICache
+    @param n_jobs: number of threads scoring the candidate features at
+        each step, -1 for one per CPU.  Implies the NumPy backend when
+        not 1.  The selection does not depend on it.
+    @type n_jobs: integer
+    @param resume_from: a selection returned by an earlier call with
+        the same data and parameters.  Only the steps past it are run.
+    @type resume_from: Selection
+    @param stop: ends the search before n_select features when the
+        criterion stops improving enough or time runs out.  Implies
+        the NumPy backend.
+    @type stop: EarlyStop
+    @param callback: called with a dict describing each step as it is
+        taken: its "step", the "feature" selected, its "score", the
+        seconds "elapsed" since the search started and the number of
+        "evaluations" so far.  Returning False stops the search
+        there.  Implies the NumPy backend.
+    @type callback: callable
+    @param store: a L{ResultStore} to look the selection up in before
+        running it, and to keep it in afterwards.
+    @type store: ResultStore
+    @param tolerance: score the candidates on growing random subsets
+        of the observations, dropping those clearly behind, and count
+        every observation only for the last contenders.  The chance at
+        each step of missing the feature the exact search selects, such
+        as 0.05, or None to search exactly.  Implies the NumPy backend.
+    @type tolerance: float
+    @param n_bins: discretize the data first into this many bins per
+        feature, see L{discretize}.
+    @type n_bins: integer
+    @param binning: "width" or "frequency" to discretize the data first
+        into bins of equal width or holding as many observations, or the
+        edges of the bins, see L{discretize}.
+    @type binning: string or ndarray
     @return selected_features: features in the order they were selected. 
     @rtype: list
   """
-  return BetaGamma(data, labels, n_select, beta=1.0, gamma=1.0)
-
-def CMIM(data, labels, n_select):
+  return BetaGamma(data, labels, n_select, beta=1.0, gamma=1.0, backend=backend,
+                   cache=cache, n_jobs=n_jobs, resume_from=resume_from,
+                   stop=stop, callback=callback, store=store, tolerance=tolerance,
+                   n_bins=n_bins, binning=binning)
+
+def CMIM(data, labels, n_select, backend=None, cache=None, n_jobs=1,
+         resume_from=None, stop=None, fast=False, callback=None, store=None,
+         n_bins=None, binning=None):
   """
     This function implements the conditional mutual information
     maximization feature selection algorithm. Note that this 
@@ -107,355 +216,804 @@ def CMIM(data, labels, n_select):
 
     @param data: A Numpy array such that len(data) = 
         n_observations, and len(data.transpose()) = n_features
-    @type data: ndarray
+    @type data: ndarray or DiscretizedDataset
     @param labels: labels represented in a numpy array with 
         n_observations as the number of elements. That is 
         len(labels) = len(data) = n_observations.
     @type labels: ndarray
     @param n_select: number of features to select.
     @type n_select: integer
+    @param backend: "c" for libFSToolbox, "numpy" for the vectorized
+        NumPy implementation, or None to use libFSToolbox whenever
+        it could be loaded and data is not integer typed.
+    @type backend: string
+    @param cache: an L{MICache} built from data and labels, implies
+        the NumPy backend.
+    @type cache: MICache
+    @param n_jobs: number of threads scoring the candidate features at
+        each step, -1 for one per CPU.  Implies the NumPy backend when
+        not 1.  The selection does not depend on it.
+    @type n_jobs: integer
+    @param resume_from: a selection returned by an earlier call with
+        the same data and parameters.  Only the steps past it are run.
+    @type resume_from: Selection
+    @param stop: ends the search before n_select features when the
+        criterion stops improving enough or time runs out.  Implies
+        the NumPy backend.
+    @type stop: EarlyStop
+    @param callback: called with a dict describing each step as it is
+        taken: its "step", the "feature" selected, its "score", the
+        seconds "elapsed" since the search started and the number of
+        "evaluations" so far.  Returning False stops the search
+        there.  Implies the NumPy backend.
+    @type callback: callable
+    @param store: a L{ResultStore} to look the selection up in before
+        running it, and to keep it in afterwards.
+    @type store: ResultStore
+    @param fast: True to score the candidates lazily, as in Fleuret's
+        fast CMIM.  A candidate is only scored against the features
+        selected since it was last scored while it could still be the
+        best, which skips most of the work on high dimensional data.
+        The selection is the same, and its skipped attribute counts
+        the scores it did not compute.  Implies the NumPy backend.
+    @type fast: boolean
+    @param n_bins: discretize the data first into this many bins per
+        feature, see L{discretize}.
+    @type n_bins: integer
+    @param binning: "width" or "frequency" to discretize the data first
+        into bins of equal width or holding as many observations, or the
+        edges of the bins, see L{discretize}.
+    @type binning: string or ndarray
     @return: features in the order that they were selected. 
     @rtype: list
   """
-  data, labels = check_data(data, labels)
-
-  # python values
-  n_observations, n_features = data.shape
-  output = np.zeros(n_select)
-
-  # cast as C types
-  c_n_observations = c.c_int(n_observations)
-  c_n_select = c.c_int(n_select)
-  c_n_features = c.c_int(n_features)
-
-  libFSToolbox.CMIM.restype = c.POINTER(c.c_double * n_select)
-  features = libFSToolbox.CMIM(c_n_select,
-                   c_n_observations,
-                   c_n_features, 
-                   data.ctypes.data_as(c.POINTER(c.c_double)),
-                   labels.ctypes.data_as(c.POINTER(c.c_double)),
-                   output.ctypes.data_as(c.POINTER(c.c_double))
-                   )
+  if n_bins is not None or binning is not None:
+    data = discretize(data, n_bins, binning)
+  if store is not None:
+    return store.select(CMIM, data, labels, n_select, backend=backend, cache=cache,
+                        n_jobs=n_jobs, resume_from=resume_from, stop=stop, fast=fast,
+                        callback=callback)
+  if _use_numpy(backend, data, labels, cache=cache, n_jobs=n_jobs, resume_from=resume_from,
+                stop=stop, fast=fast, callback=callback):
+    return _numpy_select("CMIM", data, labels, n_select, cache=cache,
+                         n_jobs=n_jobs, resume_from=resume_from, stop=stop,
+                         fast=fast, callback=callback)
 
-  selected_features = []
-  for i in features.contents:
-    selected_features.append(i)
+  return _c_select("CMIM", data, labels, n_select)
 
-  return selected_features
 
 
-
-def CondMI(data, labels, n_select):
+def CondMI(data, labels, n_select, backend=None, cache=None, n_jobs=1,
+           resume_from=None, stop=None, callback=None, store=None, n_bins=None, binning=None):
   """
     This function implements the conditional mutual information
     maximization feature selection algorithm. 
 
     @param data: data in a Numpy array such that len(data) = n_observations,
        and len(data.transpose()) = n_features
-    @type data: ndarray
+    @type data: ndarray or DiscretizedDataset
     @param labels: represented in a numpy list with 
       n_observations as the number of elements. That is 
       len(labels) = len(data) = n_observations.
     @type labels: ndarray
     @param n_select: number of features to select.
     @type n_select: integer
+    @param backend: "c" for libFSToolbox, "numpy" for the vectorized
+        NumPy implementation, or None to use libFSToolbox whenever
+        it could be loaded and data is not integer typed.
+    @type backend: string
+    @param cache: an L{MICache} built from data and labels, implies
+        the NumPy backend.
+    @type cache: MICache
+    @param n_jobs: number of threads scoring the candidate features at
+        each step, -1 for one per CPU.  Implies the NumPy backend when
+        not 1.  The selection does not depend on it.
+    @type n_jobs: integer
+    @param resume_from: a selection returned by an earlier call with
+        the same data and parameters.  Only the steps past it are run.
+    @type resume_from: Selection
+    @param stop: ends the search before n_select features when the
+        criterion stops improving enough or time runs out.  Implies
+        the NumPy backend.
+    @type stop: EarlyStop
+    @param callback: called with a dict describing each step as it is
+        taken: its "step", the "feature" selected, its "score", the
+        seconds "elapsed" since the search started and the number of
+        "evaluations" so far.  Returning False stops the search
+        there.  Implies the NumPy backend.
+    @type callback: callable
+    @param store: a L{ResultStore} to look the selection up in before
+        running it, and to keep it in afterwards.
+    @type store: ResultStore
+    @param n_bins: discretize the data first into this many bins per
+        feature, see L{discretize}.
+    @type n_bins: integer
+    @param binning: "width" or "frequency" to discretize the data first
+        into bins of equal width or holding as many observations, or the
+        edges of the bins, see L{discretize}.
+    @type binning: string or ndarray
     @return: features in the order they were selected. 
     @rtype list
   """
-  data, labels = check_data(data, labels)
-
-  # python values
-  n_observations, n_features = data.shape
-  output = np.zeros(n_select)
-
-  # cast as C types
-  c_n_observations = c.c_int(n_observations)
-  c_n_select = c.c_int(n_select)
-  c_n_features = c.c_int(n_features)
-
-  libFSToolbox.CondMI.restype = c.POINTER(c.c_double * n_select)
-  features = libFSToolbox.CondMI(c_n_select,
-                   c_n_observations,
-                   c_n_features, 
-                   data.ctypes.data_as(c.POINTER(c.c_double)),
-                   labels.ctypes.data_as(c.POINTER(c.c_double)),
-                   output.ctypes.data_as(c.POINTER(c.c_double))
-                   )
-  
-  selected_features = []
-  for i in features.contents:
-    selected_features.append(i)
-
-  return selected_features
-
-
-def Condred(data, labels, n_select):
+  if n_bins is not None or binning is not None:
+    data = discretize(data, n_bins, binning)
+  if store is not None:
+    return store.select(CondMI, data, labels, n_select, backend=backend, cache=cache,
+                        n_jobs=n_jobs, resume_from=resume_from, stop=stop,
+                        callback=callback)
+  if _use_numpy(backend, data, labels, cache=cache, n_jobs=n_jobs, resume_from=resume_from,
+                stop=stop, callback=callback):
+    return _numpy_select("CondMI", data, labels, n_select, cache=cache,
+                         n_jobs=n_jobs, resume_from=resume_from, stop=stop,
+                         callback=callback)
+
+  return _c_select("CondMI", data, labels, n_select)
+
+
+def Condred(data, labels, n_select, backend=None, cache=None, n_jobs=1,
+            resume_from=None, stop=None, callback=None, store=None, tolerance=None,
+            n_bins=None, binning=None):
   """
     This function implements the Condred feature selection algorithm.
     beta = 0; gamma = 1;
 
     @param data: data in a Numpy array such that len(data) = 
         n_observations, and len(data.transpose()) = n_features
-    @type data: ndarray
+    @type data: ndarray or DiscretizedDataset
     @param labels: labels represented in a numpy list with 
         n_observations as the number of elements. That is 
         len(labels) = len(data) = n_observations.
     @type labels: ndarray
     @param n_select: number of features to select.
     @type n_select: integer
+    @param backend: "c" for libFSToolbox, "numpy" for the vectorized
+        NumPy implementation, or None to use libFSToolbox whenever
+        it could be loaded and data is not integer typed.
+    @type backend: string
+    @param cache: an L{MICache} built from data and labels, implies
+        the NumPy backend.
+    @type cache: MICache
+    @param n_jobs: number of threads scoring the candidate features at
+        each step, -1 for one per CPU.  Implies the NumPy backend when
+        not 1.  The selection does not depend on it.
+    @type n_jobs: integer
+    @param resume_from: a selection returned by an earlier call with
+        the same data and parameters.  Only the steps past it are run.
+    @type resume_from: Selection
+    @param stop: ends the search before n_select features when the
+        criterion stops improving enough or time runs out.  Implies
+        the NumPy backend.
+    @type stop: EarlyStop
+    @param callback: called with a dict describing each step as it is
+        taken: its "step", the "feature" selected, its "score", the
+        seconds "elapsed" since the search started and the number of
+        "evaluations" so far.  Returning False stops the search
+        there.  Implies the NumPy backend.
+    @type callback: callable
+    @param store: a L{ResultStore} to look the selection up in before
+        running it, and to keep it in afterwards.
+    @type store: ResultStore
+    @param tolerance: score the candidates on growing random subsets
+        of the observations, dropping those clearly behind, and count
+        every observation only for the last contenders.  The chance at
+        each step of missing the feature the exact search selects, such
+        as 0.05, or None to search exactly.  Implies the NumPy backend.
+    @type tolerance: float
+    @param n_bins: discretize the data first into this many bins per
+        feature, see L{discretize}.
+    @type n_bins: integer
+    @param binning: "width" or "frequency" to discretize the data first
+        into bins of equal width or holding as many observations, or the
+        edges of the bins, see L{discretize}.
+    @type binning: string or ndarray
     @return: the features in the order they were selected. 
     @rtype: list
   """
-  data, labels = check_data(data, labels)
-  return BetaGamma(data, labels, n_select, beta=0.0, gamma=1.0)
+  return BetaGamma(data, labels, n_select, beta=0.0, gamma=1.0, backend=backend,
+                   cache=cache, n_jobs=n_jobs, resume_from=resume_from,
+                   stop=stop, callback=callback, store=store, tolerance=tolerance,
+                   n_bins=n_bins, binning=binning)
 
 
 
-def DISR(data, labels, n_select):
+def DISR(data, labels, n_select, backend=None, cache=None, n_jobs=1,
+         resume_from=None, stop=None, callback=None, store=None, tolerance=None,
+         n_bins=None, binning=None):
   """
     This function implements the double input symmetrical relevance
     feature selection algorithm. 
 
     @param data: data in a Numpy array such that len(data) = 
         n_observations, and len(data.transpose()) = n_features
-    @type data: ndarray
+    @type data: ndarray or DiscretizedDataset
     @param labels: labels represented in a numpy list with 
         n_observations as the number of elements. That is 
         len(labels) = len(data) = n_observations.
     @type labels: ndarray
     @param n_select: number of features to select. (REQUIRED)
     @type n_select: integer
+    @param backend: "c" for libFSToolbox, "numpy" for the vectorized
+        NumPy implementation, or None to use libFSToolbox whenever
+        it could be loaded and data is not integer typed.
+    @type backend: string
+    @param cache: an L{MICache} built from data and labels, implies
+        the NumPy backend.
+    @type cache: MICache
+    @param n_jobs: number of threads scoring the candidate features at
+        each step, -1 for one per CPU.  Implies the NumPy backend when
+        not 1.  The selection does not depend on it.
+    @type n_jobs: integer
+    @param resume_from: a selection returned by an earlier call with
+        the same data and parameters.  Only the steps past it are run.
+    @type resume_from: Selection
+    @param stop: ends the search before n_select features when the
+        criterion stops improving enough or time runs out.  Implies
+        the NumPy backend.
+    @type stop: EarlyStop
+    @param callback: called with a dict describing each step as it is
+        taken: its "step", the "feature" selected, its "score", the
+        seconds "elapsed" since the search started and the number of
+        "evaluations" so far.  Returning False stops the search
+        there.  Implies the NumPy backend.
+    @type callback: callable
+    @param store: a L{ResultStore} to look the selection up in before
+        running it, and to keep it in afterwards.
+    @type store: ResultStore
+    @param tolerance: score the candidates on growing random subsets
+        of the observations, dropping those clearly behind, and count
+        every observation only for the last contenders.  The chance at
+        each step of missing the feature the exact search selects, such
+        as 0.05, or None to search exactly.  Implies the NumPy backend.
+    @type tolerance: float
+    @param n_bins: discretize the data first into this many bins per
+        feature, see L{discretize}.
+    @type n_bins: integer
+    @param binning: "width" or "frequency" to discretize the data first
+        into bins of equal width or holding as many observations, or the
+        edges of the bins, see L{discretize}.
+    @type binning: string or ndarray
     @return: the features in the order they were selected. 
     @rtype: list
   """
-  data, labels = check_data(data, labels)
-
-  # python values
-  n_observations, n_features = data.shape
-  output = np.zeros(n_select)
-
-  # cast as C types
-  c_n_observations = c.c_int(n_observations)
-  c_n_select = c.c_int(n_select)
-  c_n_features = c.c_int(n_features)
-
-  libFSToolbox.DISR.restype = c.POINTER(c.c_double * n_select)
-  features = libFSToolbox.DISR(c_n_select,
-                   c_n_observations,
-                   c_n_features, 
-                   data.ctypes.data_as(c.POINTER(c.c_double)),
-                   labels.ctypes.data_as(c.POINTER(c.c_double)),
-                   output.ctypes.data_as(c.POINTER(c.c_double))
-                   )
-  
-  selected_features = []
-  for i in features.contents:
-    selected_features.append(i)
-
-  return selected_features
-
-def ICAP(data, labels, n_select):
+  if n_bins is not None or binning is not None:
+    data = discretize(data, n_bins, binning)
+  if store is not None:
+    return store.select(DISR, data, labels, n_select, backend=backend, cache=cache,
+                        n_jobs=n_jobs, resume_from=resume_from, stop=stop,
+                        callback=callback, tolerance=tolerance)
+  if _use_numpy(backend, data, labels, cache=cache, n_jobs=n_jobs, resume_from=resume_from,
+                stop=stop, callback=callback, tolerance=tolerance):
+    return _numpy_select("DISR", data, labels, n_select, cache=cache,
+                         n_jobs=n_jobs, resume_from=resume_from, stop=stop,
+                         callback=callback, tolerance=tolerance)
+
+  return _c_select("DISR", data, labels, n_select)
+
+def ICAP(data, labels, n_select, backend=None, cache=None, n_jobs=1,
+         resume_from=None, stop=None, callback=None, store=None, n_bins=None, binning=None):
   """
     This function implements the interaction capping feature 
     selection algorithm. 
 
     @param data: data in a Numpy array such that len(data) = 
         n_observations, and len(data.transpose()) = n_features
-    @type data: ndarray
+    @type data: ndarray or DiscretizedDataset
     @param labels: labels represented in a numpy list with 
         n_observations as the number of elements. That is 
         len(labels) = len(data) = n_observations.
     @type labels: ndarray
     @param n_select: number of features to select. (REQUIRED)
     @type n_select: integer
+    @param backend: "c" for libFSToolbox, "numpy" for the vectorized
+        NumPy implementation, or None to use libFSToolbox whenever
+        it could be loaded and data is not integer typed.
+    @type backend: string
+    @param cache: an L{MICache} built from data and labels, implies
+        the NumPy backend.
+    @type cache: MICache
+    @param n_jobs: number of threads scoring the candidate features at
+        each step, -1 for one per CPU.  Implies the NumPy backend when
+        not 1.  The selection does not depend on it.
+    @type n_jobs: integer
+    @param resume_from: a selection returned by an earlier call with
+        the same data and parameters.  Only the steps past it are run.
+    @type resume_from: Selection
+    @param stop: ends the search before n_select features when the
+        criterion stops improving enough or time runs out.  Implies
+        the NumPy backend.
+    @type stop: EarlyStop
+    @param callback: called with a dict describing each step as it is
+        taken: its "step", the "feature" selected, its "score", the
+        seconds "elapsed" since the search started and the number of
+        "evaluations" so far.  Returning False stops the search
+        there.  Implies the NumPy backend.
+    @type callback: callable
+    @param store: a L{ResultStore} to look the selection up in before
+        running it, and to keep it in afterwards.
+    @type store: ResultStore
+    @param n_bins: discretize the data first into this many bins per
+        feature, see L{discretize}.
+    @type n_bins: integer
+    @param binning: "width" or "frequency" to discretize the data first
+        into bins of equal width or holding as many observations, or the
+        edges of the bins, see L{discretize}.
+    @type binning: string or ndarray
     @return: the features in the order they were selected. 
     @rtype: list
   """
-  data, labels = check_data(data, labels)
-
-  # python values
-  n_observations, n_features = data.shape
-  output = np.zeros(n_select)
-
-  # cast as C types
-  c_n_observations = c.c_int(n_observations)
-  c_n_select = c.c_int(n_select)
-  c_n_features = c.c_int(n_features)
-
-  libFSToolbox.ICAP.restype = c.POINTER(c.c_double * n_select)
-  features = libFSToolbox.ICAP(c_n_select,
-                   c_n_observations,
-                   c_n_features, 
-                   data.ctypes.data_as(c.POINTER(c.c_double)),
-                   labels.ctypes.data_as(c.POINTER(c.c_double)),
-                   output.ctypes.data_as(c.POINTER(c.c_double))
-                   )
-  
-  selected_features = []
-  for i in features.contents:
-    selected_features.append(i)
-
-  return selected_features
-
-def JMI(data, labels, n_select):
+  if n_bins is not None or binning is not None:
+    data = discretize(data, n_bins, binning)
+  if store is not None:
+    return store.select(ICAP, data, labels, n_select, backend=backend, cache=cache,
+                        n_jobs=n_jobs, resume_from=resume_from, stop=stop,
+                        callback=callback)
+  if _use_numpy(backend, data, labels, cache=cache, n_jobs=n_jobs, resume_from=resume_from,
+                stop=stop, callback=callback):
+    return _numpy_select("ICAP", data, labels, n_select, cache=cache,
+                         n_jobs=n_jobs, resume_from=resume_from, stop=stop,
+                         callback=callback)
+
+  return _c_select("ICAP", data, labels, n_select)
+
+def JMI(data, labels, n_select, backend=None, cache=None, n_jobs=1,
+        resume_from=None, stop=None, callback=None, store=None, tolerance=None,
+        n_bins=None, binning=None):
   """
     This function implements the joint mutual information feature
     selection algorithm. 
 
     @param data: data in a Numpy array such that len(data) = 
         n_observations, and len(data.transpose()) = n_features
-    @type data: ndarray
+    @type data: ndarray or DiscretizedDataset
     @param labels: labels represented in a numpy list with 
         n_observations as the number of elements. That is 
         len(labels) = len(data) = n_observations.
     @type labels: ndarray
     @param n_select: number of features to select. (REQUIRED)
     @type n_select: integer
+    @param backend: "c" for libFSToolbox, "numpy" for the vectorized
+        NumPy implementation, or None to use libFSToolbox whenever
+        it could be loaded and data is not integer typed.
+    @type backend: string
+    @param cache: an L{MICache} built from data and labels, implies
+        the NumPy backend.
+    @type cache: MICache
+    @param n_jobs: number of threads scoring the candidate features at
+        each step, -1 for one per CPU.  Implies the NumPy backend when
+        not 1.  The selection does not depend on it.
+    @type n_jobs: integer
+    @param resume_from: a selection returned by an earlier call with
+        the same data and parameters.  Only the steps past it are run.
+    @type resume_from: Selection
+    @param stop: ends the search before n_select features when the
+        criterion stops improving enough or time runs out.  Implies
+        the NumPy backend.
+    @type stop: EarlyStop
+    @param callback: called with a dict describing each step as it is
+        taken: its "step", the "feature" selected, its "score", the
+        seconds "elapsed" since the search started and the number of
+        "evaluations" so far.  Returning False stops the search
+        there.  Implies the NumPy backend.
+    @type callback: callable
+    @param store: a L{ResultStore} to look the selection up in before
+        running it, and to keep it in afterwards.
+    @type store: ResultStore
+    @param tolerance: score the candidates on growing random subsets
+        of the observations, dropping those clearly behind, and count
+        every observation only for the last contenders.  The chance at
+        each step of missing the feature the exact search selects, such
+        as 0.05, or None to search exactly.  Implies the NumPy backend.
+    @type tolerance: float
+    @param n_bins: discretize the data first into this many bins per
+        feature, see L{discretize}.
+    @type n_bins: integer
+    @param binning: "width" or "frequency" to discretize the data first
+        into bins of equal width or holding as many observations, or the
+        edges of the bins, see L{discretize}.
+    @type binning: string or ndarray
     @return: the features in the order they were selected. 
     @rtype: list
   """
-  data, labels = check_data(data, labels)
-
-  # python values
-  n_observations, n_features = data.shape
-  output = np.zeros(n_select)
-
-  # cast as C types
-  c_n_observations = c.c_int(n_observations)
-  c_n_select = c.c_int(n_select)
-  c_n_features = c.c_int(n_features)
-
-  libFSToolbox.JMI.restype = c.POINTER(c.c_double * n_select)
-  features = libFSToolbox.JMI(c_n_select,
-                   c_n_observations,
-                   c_n_features, 
-                   data.ctypes.data_as(c.POINTER(c.c_double)),
-                   labels.ctypes.data_as(c.POINTER(c.c_double)),
-                   output.ctypes.data_as(c.POINTER(c.c_double))
-                   )
+  if n_bins is not None or binning is not None:
+    data = discretize(data, n_bins, binning)
+  if store is not None:
+    return store.select(JMI, data, labels, n_select, backend=backend, cache=cache,
+                        n_jobs=n_jobs, resume_from=resume_from, stop=stop,
+                        callback=callback, tolerance=tolerance)
+  if _use_numpy(backend, data, labels, cache=cache, n_jobs=n_jobs, resume_from=resume_from,
+                stop=stop, callback=callback, tolerance=tolerance):
+    return _numpy_select("JMI", data, labels, n_select, cache=cache,
+                         n_jobs=n_jobs, resume_from=resume_from, stop=stop,
+                         callback=callback, tolerance=tolerance)
 
-  selected_features = []
-  for i in features.contents:
-    selected_features.append(i)
-  return selected_features
+  return _c_select("JMI", data, labels, n_select)
 
 
 
-def MIFS(data, labels, n_select):
+def MIFS(data, labels, n_select, backend=None, cache=None, n_jobs=1,
+         resume_from=None, stop=None, callback=None, store=None, tolerance=None,
+         n_bins=None, binning=None):
   """
     This function implements the MIFS algorithm.
     beta = 1; gamma = 0;
 
     @param data: data in a Numpy array such that len(data) = 
         n_observations, and len(data.transpose()) = n_features
-    @type data: ndarray
+    @type data: ndarray or DiscretizedDataset
     @param labels: labels represented in a numpy list with 
         n_observations as the number of elements. That is 
         len(labels) = len(data) = n_observations.
     @type labels: ndarray
     @param n_select: number of features to select. (REQUIRED)
     @type n_select: integer
+    @param backend: "c" for libFSToolbox, "numpy" for the vectorized
+        NumPy implementation, or None to use libFSToolbox whenever
+        it could be loaded and data is not integer typed.
+    @type backend: string
+    @param cache: an L{MICache} built from data and labels, implies
+        the NumPy backend.
+    @type cache: MICache
+    @param n_jobs: number of threads scoring the candidate features at
+        each step, -1 for one per CPU.  Implies the NumPy backend when
+        not 1.  The selection does not depend on it.
+    @type n_jobs: integer
+    @param resume_from: a selection returned by an earlier call with
+        the same data and parameters.  Only the steps past it are run.
+    @type resume_from: Selection
+    @param stop: ends the search before n_select features when the
+        criterion stops improving enough or time runs out.  Implies
+        the NumPy backend.
+    @type stop: EarlyStop
+    @param callback: called with a dict describing each step as it is
+        taken: its "step", the "feature" selected, its "score", the
+        seconds "elapsed" since the search started and the number of
+        "evaluations" so far.  Returning False stops the search
+        there.  Implies the NumPy backend.
+    @type callback: callable
+    @param store: a L{ResultStore} to look the selection up in before
+        running it, and to keep it in afterwards.
+    @type store: ResultStore
+    @param tolerance: score the candidates on growing random subsets
+        of the observations, dropping those clearly behind, and count
+        every observation only for the last contenders.  The chance at
+        each step of missing the feature the exact search selects, such
+        as 0.05, or None to search exactly.  Implies the NumPy backend.
+    @type tolerance: float
+    @param n_bins: discretize the data first into this many bins per
+        feature, see L{discretize}.
+    @type n_bins: integer
+    @param binning: "width" or "frequency" to discretize the data first
+        into bins of equal width or holding as many observations, or the
+        edges of the bins, see L{discretize}.
+    @type binning: string or ndarray
     @return: the features in the order they were selected. 
     @rtype: list
   """
-  return BetaGamma(data, labels, n_select, beta=0.0, gamma=0.0)
+  return BetaGamma(data, labels, n_select, beta=0.0, gamma=0.0, backend=backend,
+                   cache=cache, n_jobs=n_jobs, resume_from=resume_from,
+                   stop=stop, callback=callback, store=store, tolerance=tolerance,
+                   n_bins=n_bins, binning=binning)
 
 
-def MIM(data, labels, n_select):
+def MIM(data, labels, n_select, backend=None, cache=None, n_jobs=1,
+        resume_from=None, stop=None, callback=None, store=None, n_bins=None, binning=None):
   """
     This function implements the MIM algorithm.
     beta = 0; gamma = 0;
 
     @param data: data in a Numpy array such that len(data) = 
         n_observations, and len(data.transpose()) = n_features
-    @type data: ndarray
+    @type data: ndarray or DiscretizedDataset
     @param labels: labels represented in a numpy list with 
         n_observations as the number of elements. That is 
         len(labels) = len(data) = n_observations.
     @type labels: ndarray
     @param n_select: number of features to select. (REQUIRED)
     @type n_select: integer
+    @param backend: "c" for libFSToolbox, "numpy" for the vectorized
+        NumPy implementation, or None to use libFSToolbox whenever
+        it could be loaded and data is not integer typed.
+    @type backend: string
+    @param cache: an L{MICache} built from data and labels, implies
+        the NumPy backend.
+    @type cache: MICache
+    @param n_jobs: number of threads scoring the candidate features at
+        each step, -1 for one per CPU.  Implies the NumPy backend when
+        not 1.  The selection does not depend on it.
+    @type n_jobs: integer
+    @param resume_from: a selection returned by an earlier call with
+        the same data and parameters.  Only the steps past it are run.
+    @type resume_from: Selection
+    @param stop: ends the search before n_select features when the
+        criterion stops improving enough or time runs out.  Implies
+        the NumPy backend.
+    @type stop: EarlyStop
+    @param callback: called with a dict describing each step as it is
+        taken: its "step", the "feature" selected, its "score", the
+        seconds "elapsed" since the search started and the number of
+        "evaluations" so far.  Returning False stops the search
+        there.  Implies the NumPy backend.
+    @type callback: callable
+    @param store: a L{ResultStore} to look the selection up in before
+        running it, and to keep it in afterwards.
+    @type store: ResultStore
+    @param n_bins: discretize the data first into this many bins per
+        feature, see L{discretize}.
+    @type n_bins: integer
+    @param binning: "width" or "frequency" to discretize the data first
+        into bins of equal width or holding as many observations, or the
+        edges of the bins, see L{discretize}.
+    @type binning: string or ndarray
     @return: the features in the order they were selected. 
     @rtype: list
   """
-  data, labels = check_data(data, labels)
-  
-  # python values
-  n_observations, n_features = data.shape
-  output = np.zeros(n_select)
-
-  # cast as C types
-  c_n_observations = c.c_int(n_observations)
-  c_n_select = c.c_int(n_select)
-  c_n_features = c.c_int(n_features)
-
-  libFSToolbox.MIM.restype = c.POINTER(c.c_double * n_select)
-  features = libFSToolbox.MIM(c_n_select,
-                   c_n_observations,
-                   c_n_features, 
-                   data.ctypes.data_as(c.POINTER(c.c_double)),
-                   labels.ctypes.data_as(c.POINTER(c.c_double)),
-                   output.ctypes.data_as(c.POINTER(c.c_double))
-                   )
-  
-  selected_features = []
-  for i in features.contents:
-    selected_features.append(i)
-  return selected_features
-
-
-def mRMR(data, labels, n_select):
+  if n_bins is not None or binning is not None:
+    data = discretize(data, n_bins, binning)
+  if store is not None:
+    return store.select(MIM, data, labels, n_select, backend=backend, cache=cache,
+                        n_jobs=n_jobs, resume_from=resume_from, stop=stop,
+                        callback=callback)
+  if _use_numpy(backend, data, labels, cache=cache, n_jobs=n_jobs, resume_from=resume_from,
+                stop=stop, callback=callback):
+    return _numpy_select("MIM", data, labels, n_select, cache=cache,
+                         n_jobs=n_jobs, resume_from=resume_from, stop=stop,
+                         callback=callback)
+
+  return _c_select("MIM", data, labels, n_select)
+
+
+def mRMR(data, labels, n_select, backend=None, cache=None, n_jobs=1,
+         resume_from=None, stop=None, callback=None, store=None, tolerance=None,
+         n_bins=None, binning=None):
   """
     This funciton implements the max-relevance min-redundancy feature
     selection algorithm. 
 
     @param data: data in a Numpy array such that len(data) = 
         n_observations, and len(data.transpose()) = n_features
-    @type data: ndarray
+    @type data: ndarray or DiscretizedDataset
     @param labels: labels represented in a numpy list with 
         n_observations as the number of elements. That is 
         len(labels) = len(data) = n_observations.
     @type labels: ndarray
     @param n_select: number of features to select. (REQUIRED)
     @type n_select: integer
+    @param backend: "c" for libFSToolbox, "numpy" for the vectorized
+        NumPy implementation, or None to use libFSToolbox whenever
+        it could be loaded and data is not integer typed.
+    @type backend: string
+    @param cache: an L{MICache} built from data and labels, implies
+        the NumPy backend.
+    @type cache: MICache
+    @param n_jobs: number of threads scoring the candidate features at
+        each step, -1 for one per CPU.  Implies the NumPy backend when
+        not 1.  The selection does not depend on it.
+    @type n_jobs: integer
+    @param resume_from: a selection returned by an earlier call with
+        the same data and parameters.  Only the steps past it are run.
+    @type resume_from: Selection
+    @param stop: ends the search before n_select features when the
+        criterion stops improving enough or time runs out.  Implies
+        the NumPy backend.
+    @type stop: EarlyStop
+    @param callback: called with a dict describing each step as it is
+        taken: its "step", the "feature" selected, its "score", the
+        seconds "elapsed" since the search started and the number of
+        "evaluations" so far.  Returning False stops the search
+        there.  Implies the NumPy backend.
+    @type callback: callable
+    @param store: a L{ResultStore} to look the selection up in before
+        running it, and to keep it in afterwards.
+    @type store: ResultStore
+    @param tolerance: score the candidates on growing random subsets
+        of the observations, dropping those clearly behind, and count
+        every observation only for the last contenders.  The chance at
+        each step of missing the feature the exact search selects, such
+        as 0.05, or None to search exactly.  Implies the NumPy backend.
+    @type tolerance: float
+    @param n_bins: discretize the data first into this many bins per
+        feature, see L{discretize}.
+    @type n_bins: integer
+    @param binning: "width" or "frequency" to discretize the data first
+        into bins of equal width or holding as many observations, or the
+        edges of the bins, see L{discretize}.
+    @type binning: string or ndarray
     @return: the features in the order they were selected. 
     @rtype: list
   """
+  if n_bins is not None or binning is not None:
+    data = discretize(data, n_bins, binning)
+  if store is not None:
+    return store.select(mRMR, data, labels, n_select, backend=backend, cache=cache,
+                        n_jobs=n_jobs, resume_from=resume_from, stop=stop,
+                        callback=callback, tolerance=tolerance)
+  if _use_numpy(backend, data, labels, cache=cache, n_jobs=n_jobs, resume_from=resume_from,
+                stop=stop, callback=callback, tolerance=tolerance):
+    return _numpy_select("mRMR", data, labels, n_select, cache=cache,
+                         n_jobs=n_jobs, resume_from=resume_from, stop=stop,
+                         callback=callback, tolerance=tolerance)
+
+  return _c_select("mRMR_D", data, labels, n_select)
+
+def _c_function(name):
+  """
+    The libFSToolbox function name, with its prototype set.  Raise an
+    exception if the library loaded lacks it.
+  """
+  if name not in _C_PROTOTYPES:
+    raise Exception("libFSToolbox.so has no " + name + ", use backend=\"numpy\".")
+  return _C_PROTOTYPES[name]
+
+
+def _c_select(name, data, labels, n_select, *weights):
+  """
+    Run the libFSToolbox function name, whose prototype is set when
+    the library is loaded, and return the features it selects with
+    the seconds spent converting the input and in the library.
+    weights are the beta and gamma of BetaGamma.
+  """
+  started = time.time()
   data, labels = check_data(data, labels)
+  converted = time.time()
 
-  # python values
   n_observations, n_features = data.shape
   output = np.zeros(n_select)
-
-  # cast as C types
-  c_n_observations = c.c_int(n_observations)
-  c_n_select = c.c_int(n_select)
-  c_n_features = c.c_int(n_features)
-
-  libFSToolbox.mRMR_D.restype = c.POINTER(c.c_double * n_select)
-  features = libFSToolbox.mRMR_D(c_n_select,
-                   c_n_observations,
-                   c_n_features, 
-                   data.ctypes.data_as(c.POINTER(c.c_double)),
-                   labels.ctypes.data_as(c.POINTER(c.c_double)),
-                   output.ctypes.data_as(c.POINTER(c.c_double))
-                   )
-
-  selected_features = []
-  for i in features.contents:
-    selected_features.append(i)
-  return selected_features
-
-def check_data(data, labels):
+  # the selected features are written into output
+  _c_function(name)(n_select, n_observations, n_features, data.ctypes.data,
+                    labels.ctypes.data, output.ctypes.data, *weights)
+
+  selection = Selection(output.tolist())
+  selection.timings = {"convert": converted - started, "select": time.time() - converted}
+  return selection
+
+# the selectors by name, for select_many
+_SELECTORS = {
+  "BetaGamma": BetaGamma, "CIFE": CIFE, "CMIM": CMIM, "CondMI": CondMI,
+  "Condred": Condred, "DISR": DISR, "ICAP": ICAP, "JMI": JMI, "MIFS": MIFS,
+  "MIM": MIM, "mRMR": mRMR,
+}
+
+def select_many(jobs, max_workers=None):
+  """
+    Run many feature selections at once on a pool of threads.  The
+    C library releases the GIL while it runs, so independent jobs
+    proceed in parallel.
+
+      >>> select_many([("JMI", data, labels, 10),
+      ...              ("BetaGamma", data, labels, 10, {"beta": 0.5})])
+
+    @param jobs: (algorithm, data, labels, n_select) tuples, with an
+      optional fifth element holding a dict of keyword arguments for
+      the selector, such as beta, gamma, backend or cache.  algorithm
+      is the name of a selector, e.g. "JMI", or the selector itself.
+    @type jobs: list
+    @param max_workers: number of threads, one per CPU by default.
+    @type max_workers: integer
+    @return: the features selected by each job, in the order of jobs.
+    @rtype: list
+  """
+  from concurrent.futures import ThreadPoolExecutor
+  if max_workers is None:
+    import multiprocessing
+    max_workers = multiprocessing.cpu_count()
+
+  calls = []
+  for job in jobs:
+    algorithm, data, labels, n_select = job[:4]
+    params = job[4] if len(job) > 4 else {}
+    calls.append((_selector(algorithm), data, labels, n_select, params))
+
+  with ThreadPoolExecutor(max_workers=max_workers) as pool:
+    futures = [pool.submit(f, data, labels, n_select, **params)
+               for f, data, labels, n_select, params in calls]
+    return [future.result() for future in futures]
+
+
+# the libFSToolbox function behind every selector, and its weights
+_C_FUNCTIONS = {
+  "BetaGamma": ("BetaGamma", None), "CIFE": ("BetaGamma", (1.0, 1.0)),
+  "CMIM": ("CMIM", ()), "CondMI": ("CondMI", ()), "Condred": ("BetaGamma", (0.0, 1.0)),
+  "DISR": ("DISR", ()), "ICAP": ("ICAP", ()), "JMI": ("JMI", ()),
+  "MIFS": ("BetaGamma", (0.0, 0.0)), "MIM": ("MIM", ()), "mRMR": ("mRMR_D", ()),
+}
+
+def select_batch(algorithm, data, labels, n_select, n_jobs=1, backend=None, **params):
+  """
+    Run one selector on many small problems of the same shape, such
+    as one per group of samples, and return the features selected for
+    all of them as one array.  On libFSToolbox the problems are
+    converted to doubles a block at a time and the library is then
+    called once per problem with nothing but numbers, which saves
+    most of what a small selection costs when the selector is called
+    on its own.  Data whose problems already are Fortran ordered
+    doubles, such as np.asarray(groups).transpose(0, 2, 1) of a
+    n_problems x n_features x n_observations array, is not copied.
+
+      >>> groups = np.random.randint(0, 3, (1000, 200, 100)).astype(float)
+      >>> select_batch("JMI", groups, group_labels, 10)
+
+    @param algorithm: the name of a selector, e.g. "JMI", or the
+      selector itself.
+    @param data: n_problems x n_observations x n_features array, or a
+      list of n_observations x n_features arrays.
+    @type data: ndarray
+    @param labels: n_problems x n_observations array, or a list of
+      the labels of each problem.
+    @type labels: ndarray
+    @param n_select: number of features to select for each problem.
+    @type n_select: integer
+    @param n_jobs: number of threads the problems are shared between,
+      -1 for one per CPU.  The C library releases the GIL while it runs.
+    @type n_jobs: integer
+    @param backend: "c", "numpy" or None, as for the selectors.
+    @type backend: string
+    @param params: keyword arguments of the selector, such as beta and
+      gamma.  Any other runs every problem through the selector itself.
+    @return: the features selected for each problem, one row each,
+      padded with -1 like CondMI does where a search ended early.
+    @rtype: ndarray
+  """
+  selector = _selector(algorithm)
+  data, labels = np.asarray(data), np.asarray(labels)
+  if data.ndim != 3 or labels.shape != data.shape[:2]:
+    raise Exception("data must be n_problems x n_observations x n_features, "
+                    "and labels n_problems x n_observations.")
+  n_problems, n_observations, n_features = data.shape
+
+  name, weights = _C_FUNCTIONS.get(getattr(selector, "__name__", None), (None, None))
+  if (name is None or _SELECTORS.get(selector.__name__) is not selector or
+      set(params) - set(["beta", "gamma"] if weights is None else []) or
+      n_problems == 0 or _use_numpy(backend, data[0], labels[0])):
+    selections = _map(lambda i: selector(data[i], labels[i], n_select, backend=backend,
+                                         **params), range(n_problems), n_jobs)
+    output = -np.ones((n_problems, n_select), dtype=np.int64)
+    for i, selection in enumerate(selections):
+      # a stop or a callback may end a search early
+      output[i, :len(selection)] = selection
+    return output
+
+  if weights is None:
+    weights = (params.get("beta", 1.0), params.get("gamma", 1.0))
+  function = _c_function(name)
+  labels = np.array(labels, dtype=np.float64, order="C")
+  output = np.zeros((n_problems, n_select))
+  # data whose problems already are Fortran ordered doubles is passed
+  # as it is, anything else is converted a few problems at a time, a
+  # block small enough to stay in cache until the library reads it
+  problems = data.transpose(0, 2, 1)
+  ready = problems.dtype == np.float64 and problems.flags.c_contiguous
+  chunk = max(1, (1 << 18) // max(n_observations * n_features, 1))
+
+  def run(block):
+    for start in range(block[0], block[1], chunk):
+      stop = min(start + chunk, block[1])
+      converted = problems[start:stop] if ready else np.ascontiguousarray(problems[start:stop],
+                                                                          dtype=np.float64)
+      for i in range(start, stop):
+        function(n_select, n_observations, n_features,
+                 converted.ctypes.data + (i - start) * converted.strides[0],
+                 labels.ctypes.data + i * labels.strides[0],
+                 output.ctypes.data + i * output.strides[0], *weights)
+
+  n_workers = min(_n_workers(n_jobs), n_problems)
+  _map(run, [(k * n_problems // n_workers, (k + 1) * n_problems // n_workers)
+             for k in range(n_workers)], n_workers)
+  return output.astype(np.int64)
+
+
+def check_data(data, labels, cast=True):
   """
     Check dimensions of the data and the labels.  Raise and exception
     if there is a problem.
 
-    Data and Labels are automatically cast as doubles before calling the 
-    feature selection functions
+    Data and Labels are cast as Fortran ordered doubles before calling
+    the feature selection functions.  Arrays that already are pass
+    through without a copy, anything else is copied exactly once.
 
     @param data: the data 
     @param labels: the labels
+    @param cast: False to only check the arrays.  The NumPy backend
+      reads integer states directly and never needs doubles.
     @return (data, labels): ndarray of floats
     @rtype: tuple
   """
@@ -468,4 +1026,3019 @@ def check_data(data, labels):
   if len(data) != len(labels):
     raise Exception("data and labels must be the same length")
 
-  return 1.0*np.array(data, order="F"), 1.0*np.array(labels, order="F")
+  if cast is False:
+    return data, labels
+  return (np.asarray(data, dtype=np.float64, order="F"),
+          np.asarray(labels, dtype=np.float64, order="F"))
+
+
+def load_table(path, label_column=-1, delimiter=None, skip_header=0, chunk_size=1 << 22):
+  """
+    Read a table of features with a column of labels, such as the
+    tab separated exports of QIIME, into the compact integer matrix
+    the NumPy backend works on.  Values are floored, as MIToolbox
+    does.  Text is parsed by NumPy a block of lines at a time, and the
+    rows of a .npy file, which is memory mapped, a block at a time, so
+    that beyond the matrix returned only one block is held in memory:
+
+      >>> data, labels = load_table("otus.tsv")
+      >>> JMI(data, labels, 10)
+
+    @param path: a text file with a row per observation, or a .npy file.
+    @type path: string
+    @param label_column: the column holding the labels, the last one by
+      default, or None if the table holds no labels.
+    @type label_column: integer
+    @param delimiter: the character between the values of a line, "," for
+      files ending in .csv and any whitespace otherwise.
+    @type delimiter: string
+    @param skip_header: number of lines at the top of a text file to skip.
+    @type skip_header: integer
+    @param chunk_size: number of bytes parsed at once.
+    @type chunk_size: integer
+    @return (data, labels): the features as a Fortran ordered matrix of
+      the smallest integer type holding every value, and the labels, or
+      None without a label column.
+    @rtype: tuple
+  """
+  if path.endswith(".npy"):
+    table = np.load(path, mmap_mode="r")
+    if table.ndim != 2:
+      raise Exception("the table must be two dimensional.")
+    step = max(1, chunk_size // max(table.strides[0], 1))
+    blocks = (table[start:start + step] for start in range(0, len(table), step))
+    n_rows, n_columns = table.shape
+  else:
+    if delimiter is None and path.endswith(".csv"):
+      delimiter = ","
+    n_rows, n_columns = _count_lines(path, delimiter, skip_header, chunk_size)
+    blocks = _parse_lines(path, delimiter, skip_header, chunk_size, n_columns)
+  if label_column is not None and not -n_columns <= label_column < n_columns:
+    raise Exception("the table has no column " + str(label_column) + ".")
+
+  features = np.ones(n_columns, dtype=bool)
+  if label_column is not None:
+    features[label_column] = False
+  data = np.zeros((n_rows, n_columns - (label_column is not None)), dtype=np.uint8, order="F")
+  labels = None if label_column is None else np.zeros(n_rows, dtype=np.uint8)
+  row, data_extremes, label_extremes = 0, [0, 0], [0, 0]
+  for block in blocks:
+    block = np.floor(block) if not _is_integer(block) else block
+    if len(block) == 0:
+      continue
+    # widen the output whenever a block holds values it cannot
+    data = _fit(data, block[:, features], data_extremes)
+    data[row:row + len(block)] = block[:, features]
+    if labels is not None:
+      labels = _fit(labels, block[:, label_column], label_extremes)
+      labels[row:row + len(block)] = block[:, label_column]
+    row += len(block)
+  if row < n_rows:
+    # blank lines were counted as rows
+    data = np.asfortranarray(data[:row])
+    labels = None if labels is None else labels[:row]
+  return data, labels
+
+
+def _fit(array, values, extremes):
+  """
+    array, or a copy of it of a type wide enough to also hold values.
+    extremes holds the smallest and largest value seen so far, and is
+    updated.
+  """
+  if values.size == 0:
+    return array
+  extremes[0] = min(extremes[0], int(values.min()))
+  extremes[1] = max(extremes[1], int(values.max()))
+  lo, hi = extremes
+  for dtype in ((np.uint8, np.uint16, np.uint32) if lo >= 0 else
+                (np.int8, np.int16, np.int32)):
+    if np.iinfo(dtype).min <= lo and hi <= np.iinfo(dtype).max:
+      break
+  else:
+    dtype = np.int64
+  return array if dtype == array.dtype else array.astype(dtype, order="K")
+
+
+def _count_lines(path, delimiter, skip_header, chunk_size):
+  """
+    Number of lines of a text file past its header, and of values in
+    the first of them.
+  """
+  first, last = None, b"\n"
+  with open(path, "rb") as f:
+    for _ in range(skip_header):
+      f.readline()
+    while first is None or first.strip() == b"":
+      first = f.readline()
+      if first == b"":
+        raise Exception(path + " holds no values.")
+    n_lines = 1
+    block = f.read(chunk_size)
+    while block:
+      n_lines += block.count(b"\n")
+      last = block[-1:]
+      block = f.read(chunk_size)
+  if last != b"\n":
+    n_lines += 1
+  if delimiter is not None:
+    first = first.replace(delimiter.encode("ascii"), b" ")
+  return n_lines, len(first.split())
+
+
+def _parse_lines(path, delimiter, skip_header, chunk_size, n_columns):
+  """
+    The rows of a text file past its header, a block of whole lines at
+    a time.
+  """
+  with open(path, "rb") as f:
+    for _ in range(skip_header):
+      f.readline()
+    rest = b""
+    while True:
+      block = f.read(chunk_size)
+      if not block:
+        break
+      end = block.rfind(b"\n") + 1
+      if end == 0:
+        rest += block
+        continue
+      text, rest = rest + block[:end], block[end:]
+      yield _parse(text, delimiter, n_columns, path)
+    if rest.strip():
+      yield _parse(rest, delimiter, n_columns, path)
+
+
+# NumPy parses text in C from 1.23 on, older versions go through the
+# slower np.fromstring
+_C_PARSER = np.lib.NumpyVersion(np.__version__) >= "1.23.0"
+
+def _parse(text, delimiter, n_columns, path):
+  """
+    Lines of text as a matrix of n_columns columns, of integers when
+    they all are.
+  """
+  if _C_PARSER:
+    try:
+      rows = np.loadtxt(io.BytesIO(text), dtype=np.int64, delimiter=delimiter,
+                        comments=None, ndmin=2)
+    except ValueError:
+      try:
+        rows = np.loadtxt(io.BytesIO(text), delimiter=delimiter, comments=None, ndmin=2)
+      except ValueError as error:
+        raise Exception("could not parse " + path + ": " + str(error))
+  else:
+    if delimiter is not None:
+      text = text.replace(delimiter.encode("ascii"), b" ")
+    values = np.fromstring(text, sep=" ")
+    if values.size % n_columns != 0:
+      raise Exception("could not parse " + path + ": the lines must all hold " +
+                      str(n_columns) + " values.")
+    rows = values.reshape(-1, n_columns)
+  if rows.shape[1] != n_columns and rows.size > 0:
+    raise Exception("could not parse " + path + ": the lines must all hold " +
+                    str(n_columns) + " values.")
+  return rows
+
+
+def bin_edges(data, n_bins=10, binning="width", chunk_size=10000, sample_size=1 << 16):
+  """
+    The edges between the bins of every column of continuous data, for
+    L{discretize}.  A value x of column j falls in bin
+    sum(x >= edges[:, j]).  The data is read a block of rows at a time,
+    so the edges of a matrix that does not fit in memory can be found
+    first and each block discretized with them afterwards:
+
+      >>> edges = bin_edges(blocks, n_bins=8, binning="frequency")
+      >>> for block in blocks():
+      ...   states = discretize(block, binning=edges)
+
+    @param data: n_observations x n_features array, np.memmap or path
+      of a .npy file, or a function returning a fresh iterator over
+      blocks of rows each time it is called.
+    @type data: ndarray, string or callable
+    @param n_bins: number of bins of every column.
+    @type n_bins: integer
+    @param binning: "width" for bins of equal width between the smallest
+      and largest value of each column, "frequency" for bins holding
+      as many observations each, as far as ties allow.
+    @type binning: string
+    @param chunk_size: number of rows read at once from an array.
+    @type chunk_size: integer
+    @param sample_size: the quantiles of "frequency" are found among at
+      most twice this many rows, evenly spread over the data.
+    @type sample_size: integer
+    @return: (n_bins - 1) x n_features array of edges.
+    @rtype: ndarray
+  """
+  if n_bins < 1:
+    raise Exception("n_bins must be at least 1.")
+  if binning not in ("width", "frequency"):
+    raise Exception("binning must be \"width\", \"frequency\" or an array of edges.")
+  lo, hi, sample, stride, n_rows = None, None, [], 1, 0
+  for block in _row_blocks(data, chunk_size):
+    if binning == "width":
+      block_lo, block_hi = block.min(axis=0), block.max(axis=0)
+      lo = block_lo if lo is None else np.minimum(lo, block_lo)
+      hi = block_hi if hi is None else np.maximum(hi, block_hi)
+    else:
+      # every stride-th row, with the stride doubled whenever the
+      # sample outgrows twice its size
+      sample.append(np.array(block[(-n_rows) % stride::stride], dtype=np.float64))
+      if sum(len(rows) for rows in sample) > 2 * sample_size:
+        sample, stride = [np.concatenate(sample)[::2]], stride * 2
+    n_rows += len(block)
+  if n_rows == 0:
+    raise Exception("data must hold at least one row.")
+  fractions = np.arange(1, n_bins) / float(n_bins)
+  if binning == "width":
+    lo, hi = lo.astype(np.float64), hi.astype(np.float64)
+    return lo + fractions[:, None] * (hi - lo)
+  return np.quantile(np.concatenate(sample), fractions, axis=0).reshape(n_bins - 1, -1)
+
+
+def discretize(data, n_bins=None, binning=None, chunk_size=10000):
+  """
+    Discretize continuous data into the compact integer states the
+    selectors work on, so that each column has a few states rather
+    than one per distinct value.  All the columns are discretized at
+    once, a block of rows at a time, straight into the output, so no
+    other copy of the data is made.  The selectors take n_bins and
+    binning and discretize their data with this first:
+
+      >>> JMI(measurements, labels, 10, n_bins=8, binning="frequency")
+
+    @param data: n_observations x n_features array, np.memmap or path
+      of a .npy file, or a function returning a fresh iterator over
+      blocks of rows each time it is called.
+    @type data: ndarray, string or callable
+    @param n_bins: number of bins of every column, 10 by default.
+    @type n_bins: integer
+    @param binning: "width" (the default) or "frequency", see
+      L{bin_edges}, or the edges themselves: an array of increasing
+      edges shared by every column, or one column of edges per
+      feature as returned by L{bin_edges}.
+    @type binning: string or ndarray
+    @param chunk_size: number of rows discretized at once.
+    @type chunk_size: integer
+    @return: the bin of every value, a Fortran ordered matrix of the
+      smallest unsigned integer type holding n_bins states.
+    @rtype: ndarray
+  """
+  if _is_data_set(data) or _is_sparse(data):
+    raise Exception("n_bins and binning need the data as a dense array.")
+  if binning is None or isinstance(binning, str):
+    edges = bin_edges(data, 10 if n_bins is None else n_bins, binning or "width", chunk_size)
+  else:
+    edges = np.asarray(binning, dtype=np.float64)
+    edges = edges[:, None] if edges.ndim == 1 else edges
+    if n_bins is not None and n_bins != len(edges) + 1:
+      raise Exception("n_bins does not match the number of edges.")
+  dtype = _state_dtype(len(edges) + 1)
+
+  if isinstance(data, str):
+    data = np.load(data, mmap_mode="r")
+  # arrays are discretized into an output allocated once, blocks of
+  # unknown number one after the other
+  output = None if callable(data) else np.zeros(np.shape(data), dtype=dtype, order="F")
+  blocks, row = [], 0
+  for block in _row_blocks(data, chunk_size):
+    if block.ndim != 2 or edges.shape[1] not in (1, block.shape[1]):
+      raise Exception("binning must hold one column of edges per feature.")
+    # the states are counted in the order of the block, which is much
+    # faster than striding across it, and copied into place after
+    in_place = output is not None and not block.flags.c_contiguous
+    if in_place:
+      states = output[row:row + len(block)]
+    else:
+      states = np.zeros(block.shape, dtype=dtype)
+    if len(edges) <= 32:
+      for edge in edges:
+        states += block >= edge
+    else:
+      for j in range(block.shape[1]):
+        states[:, j] = np.searchsorted(edges[:, j % edges.shape[1]], block[:, j], side="right")
+    if output is None:
+      blocks.append(states)
+    elif not in_place:
+      output[row:row + len(block)] = states
+    row += len(block)
+  if output is not None:
+    return output
+  return np.asfortranarray(np.concatenate(blocks))
+
+
+def _row_blocks(data, chunk_size):
+  """
+    The rows of an array, a .npy file or a function returning an
+    iterator over blocks, a block at a time.
+  """
+  if isinstance(data, str):
+    data = np.load(data, mmap_mode="r")
+  if callable(data):
+    for block in data():
+      yield np.asarray(block)
+    return
+  data = np.asarray(data) if not isinstance(data, np.ndarray) else data
+  if data.ndim != 2:
+    raise Exception("data must be a two dimensional array.")
+  for start in range(0, len(data), chunk_size):
+    yield data[start:start + chunk_size]
+
+
+#################################################################
+# NumPy backend
+#################################################################
+
+# number of int64 codes counted by a single call to np.bincount
+_BLOCK_SIZE = 1 << 22
+
+# algorithms implemented by the NumPy backend
+_ALGORITHMS = ("BetaGamma", "CMIM", "CondMI", "DISR", "ICAP", "JMI", "MIM", "mRMR")
+
+# options of the selectors that only the NumPy backend implements, and
+# their defaults
+_NUMPY_OPTIONS = {"cache": None, "n_jobs": 1, "resume_from": None, "stop": None,
+                  "fast": False, "callback": None, "tolerance": None}
+
+# observations in the smallest subset of the approximate search, and
+# the number of groups it is split into
+_FIRST_SAMPLE = 1 << 13
+_GROUPS = 8
+
+# scores at or below this are treated as zero information by CondMI
+_EPSILON = 1e-12
+
+
+def _use_numpy(backend, data=None, labels=None, **options):
+  """
+    Decide whether a selector should run on the NumPy backend.
+
+    @param backend: "c", "numpy" or None
+    @param data: the data passed to the selector.  Data sets always
+      go to the NumPy backend.  Integer data goes to the NumPy backend
+      unless the C library is asked for, since libFSToolbox would
+      need it widened to doubles.
+    @param labels: the labels passed to the selector.  2-D labels, one
+      column per target, go to the NumPy backend.
+    @param options: the options passed to the selector that only the
+      NumPy backend implements.  Any of them not at its default value
+      selects the NumPy backend.
+    @return: True if the NumPy backend should be used.
+    @rtype: bool
+  """
+  numpy_only = [name for name in sorted(options)
+                if options[name] is not _NUMPY_OPTIONS[name]
+                and options[name] != _NUMPY_OPTIONS[name]]
+  if _is_data_set(data):
+    numpy_only.append("a data set")
+  elif _is_sparse(data):
+    numpy_only.append("sparse data")
+  if np.ndim(labels) == 2:
+    numpy_only.append("more than one target")
+  if numpy_only:
+    if backend == "c":
+      raise Exception(numpy_only[0] + " is only available on the NumPy backend.")
+    return True
+  if backend is None:
+    return libFSToolbox is None or _is_integer(data)
+  if backend == "numpy":
+    return True
+  if backend == "c":
+    if libFSToolbox is None:
+      raise Exception("libFSToolbox.so could not be loaded, use backend=\"numpy\".")
+    return False
+  raise Exception("backend must be \"c\", \"numpy\" or None.")
+
+
+def _is_integer(x):
+  """
+    True for integer and boolean arrays.
+  """
+  return isinstance(x, np.ndarray) and x.dtype.kind in "uib"
+
+
+def _is_sparse(x):
+  """
+    True for scipy.sparse matrices.  scipy is only needed for sparse
+    data, and a sparse matrix cannot exist unless scipy.sparse has
+    been imported already, so it is never imported here.
+  """
+  sparse = sys.modules.get("scipy.sparse")
+  return sparse is not None and sparse.issparse(x)
+
+
+def _state_dtype(n_states):
+  """
+    Smallest unsigned integer type able to hold the states
+    0..n_states-1.
+  """
+  for dtype in (np.uint8, np.uint16, np.uint32):
+    if n_states - 1 <= np.iinfo(dtype).max:
+      return dtype
+  return np.uint64
+
+
+def _compact(codes, n_codes):
+  """
+    Relabel non-negative integer codes smaller than n_codes onto the
+    dense states 0..k-1, keeping their order.
+
+    @return (states, k): the relabelled codes and the number of states.
+    @rtype: tuple
+  """
+  if n_codes <= max(4*len(codes), 1 << 16):
+    present = np.bincount(codes, minlength=n_codes) > 0
+    remap = np.cumsum(present) - 1
+    return remap[codes], int(remap[-1]) + 1
+  values, states = np.unique(codes, return_inverse=True)
+  return states.ravel(), len(values)
+
+
+def _encode(x):
+  """
+    Map a vector onto dense integer states.  As in MIToolbox, values
+    are floored so that 2.0 and 2.5 fall into the same state.
+
+    @return (states, k): the states and the number of states.
+    @rtype: tuple
+  """
+  if _is_integer(x):
+    x = x.astype(np.int64)
+  else:
+    x = np.floor(x)
+  lo, hi = x.min(), x.max()
+  if hi - lo < max(4*len(x), 1 << 16):
+    return _compact((x - lo).astype(np.intp), int(hi - lo) + 1)
+  values, states = np.unique(x, return_inverse=True)
+  return states.ravel(), len(values)
+
+
+def _entropy(counts, n):
+  """
+    Entropy in bits of each segment of a flattened count table.
+
+    @param counts: (offsets, counts) as built by L{DiscretizedDataset.joint_entropies}
+    @param n: number of observations behind every segment.
+  """
+  offsets, counts = counts
+  counts = counts.astype(np.float64)
+  plogp = counts * np.log2(np.maximum(counts, 1.0))
+  return np.log2(n) - np.add.reduceat(plogp, offsets) / n
+
+
+def _block_step(n_rows, cardinality, k):
+  """
+    Number of columns to count at once so that neither the codes nor
+    the count table of a block exceed _BLOCK_SIZE entries.
+  """
+  widest = max(int(cardinality.max()) * k, 1) if len(cardinality) else 1
+  return max(1, min(_BLOCK_SIZE // max(n_rows, 1), _BLOCK_SIZE // widest))
+
+
+def _column_blocks(n_features, step, n_jobs):
+  """
+    Split the columns into (first, last) ranges of at most step
+    columns, and into at least n_jobs ranges when there are enough
+    columns to go around.
+  """
+  step = max(1, min(step, -(-n_features // max(_n_workers(n_jobs), 1))))
+  return [(a, min(a + step, n_features)) for a in range(0, n_features, step)]
+
+
+def _n_workers(n_jobs):
+  """
+    Number of threads meant by n_jobs, where -1 means one per CPU.
+  """
+  if n_jobs is None:
+    return 1
+  if n_jobs < 0:
+    import multiprocessing
+    return multiprocessing.cpu_count()
+  return n_jobs
+
+
+def _map(function, items, n_jobs):
+  """
+    Apply function to every item, on a pool of n_jobs threads when
+    n_jobs is not 1.  The items are handled independently, so the
+    results do not depend on n_jobs.
+
+    On the NumPy backend the threads only overlap where NumPy releases
+    the GIL: in the integer arithmetic encoding the joint states, and
+    in the counting loop of np.bincount, which holds the GIL while it
+    first scans its input for about 40% of its time.  About a tenth of
+    a greedy step of JMI then runs under the GIL (10^4 to 10^5 rows,
+    200 to 500 features), which bounds n_jobs=4 to about 3 times as
+    fast as one thread, and less once memory bandwidth runs out.
+  """
+  n_workers = min(_n_workers(n_jobs), len(items))
+  if n_workers <= 1:
+    return [function(item) for item in items]
+  from concurrent.futures import ThreadPoolExecutor
+  with ThreadPoolExecutor(max_workers=n_workers) as pool:
+    return list(pool.map(function, items))
+
+
+def _joint_counts(states, cardinality, z, k, weights=None):
+  """
+    Count the joint states of every column of states with z in a
+    single bincount, each column owning its own range of
+    cardinality[j] * k bins in the flattened count table.
+
+    @param states: block of columns of integer states.
+    @param cardinality: number of states of each column.
+    @param z: column vector of states 0..k-1 (or 0).
+    @param weights: how many times each row is counted, or None for
+      once.
+    @return (offsets, counts): where the bins of each column start,
+      and the count table.
+    @rtype: tuple
+  """
+  width = cardinality * k
+  offsets = np.zeros(len(width), dtype=np.int64)
+  np.cumsum(width[:-1], out=offsets[1:])
+  codes = states.astype(np.int64)
+  codes *= k
+  codes += z
+  codes += offsets
+  if weights is None:
+    return offsets, np.bincount(codes.ravel(order="K"), minlength=int(width.sum()))
+  return offsets, np.bincount(codes.ravel(order="F"), np.tile(weights, codes.shape[1]),
+                              minlength=int(width.sum()))
+
+
+class DiscretizedDataset(object):
+  """
+    Data and labels mapped onto integer states once, together with the
+    cardinality, marginal counts and entropy of every column, so that
+    repeated selections on the same data skip all of that work.
+    Columns are stored with the smallest integer type that fits, and
+    small non-negative integer data is used in place.  Joint entropies
+    of every feature with some other variable are computed for all
+    features at once.
+
+    Pass the data set to any selector in place of the data.  The labels
+    are taken from the data set and the labels argument may be None.
+
+      >>> dataset = DiscretizedDataset(data, labels)
+      >>> JMI(dataset, None, 10)
+
+    A data set can be pickled, or written with L{save} and read back
+    with L{load} without encoding or counting anything again.
+
+    @ivar data: the states, n_observations x n_features.
+    @ivar labels: the label states.
+    @ivar cardinality: number of states of each feature.
+    @ivar state_counts: marginal counts of the states of every feature,
+      one feature after another.  The counts of feature j start at
+      state_offsets[j].
+    @ivar label_counts: marginal counts of the label states.
+    @ivar entropy: H(X_j) of every feature.
+    @ivar relevance: I(X_j;Y) of every feature.
+    @ivar weights: how many times each observation is counted, or None
+      when every observation is counted once.  See L{resample}.
+    @ivar n_samples: number of observations counted, the sum of the
+      weights.
+  """
+
+  # what save writes, everything else is derived from these
+  _saved = ("data", "labels", "n_label_states", "cardinality", "state_counts",
+            "label_counts", "label_joint_entropy")
+
+  weights = None
+
+  def __init__(self, data, labels, n_jobs=1):
+    """
+      @param data: data in a Numpy array such that len(data) = 
+        n_observations, and len(data.transpose()) = n_features
+      @type data: ndarray
+      @param labels: labels represented in a numpy list with 
+        n_observations as the number of elements.
+      @type labels: ndarray
+      @param n_jobs: number of threads counting the marginals.
+      @type n_jobs: integer
+    """
+    data, labels = check_data(data, labels, cast=False)
+    n_observations, n_features = data.shape
+
+    self.labels, self.n_label_states = _encode(labels)
+    if data.dtype.kind == "b":
+      data = data.view(np.uint8)
+    if (data.dtype.kind in "ui" and data.size > 0 and data.min() >= 0
+        and data.max() < max(4*n_observations, 1 << 16)):
+      # small non-negative integers already are states, and are read in
+      # place.  States that never occur leave empty bins in the count
+      # tables, which do not change any entropy.
+      self.data = data
+      self.cardinality = data.max(axis=0).astype(np.int64) + 1
+    else:
+      self.cardinality = np.zeros(n_features, dtype=np.int64)
+      self.data = np.empty((n_observations, n_features), dtype=np.uint8, order="F")
+      for j in range(n_features):
+        states, k = _encode(data[:, j])
+        if k - 1 > np.iinfo(self.data.dtype).max:
+          self.data = self.data.astype(_state_dtype(k), order="F")
+        self.data[:, j] = states
+        self.cardinality[j] = k
+
+    self.n_samples = n_observations
+    self.state_counts = self._marginal_counts(n_jobs)
+    self.label_counts = np.bincount(self.labels, minlength=self.n_label_states)
+    self.label_joint_entropy = self.joint_entropies(self.labels, self.n_label_states, n_jobs)
+    self._derive()
+
+  def _derive(self):
+    """
+      Fill in everything that follows from the saved attributes.
+    """
+    self.n_observations, self.n_features = self.data.shape
+    self.shape = self.data.shape
+    if self.weights is None:
+      self.n_samples = self.n_observations
+    else:
+      self.n_samples = float(self.weights.sum())
+    self.n_label_states = int(self.n_label_states)
+    self.state_offsets = np.zeros(self.n_features, dtype=np.int64)
+    np.cumsum(self.cardinality[:-1], out=self.state_offsets[1:])
+
+    # H(X_j), H(Y), H(X_j,Y) and I(X_j;Y)
+    self.entropy = _entropy((self.state_offsets, self.state_counts), self.n_samples)
+    self.label_entropy = _entropy(([0], self.label_counts), self.n_samples)[0]
+    self.relevance = self.entropy + self.label_entropy - self.label_joint_entropy
+
+  def _marginal_counts(self, n_jobs=1):
+    """
+      Count the states of every feature, a block of columns at a time.
+    """
+    n_observations, n_features = self.data.shape
+    offsets = np.zeros(n_features + 1, dtype=np.int64)
+    np.cumsum(self.cardinality, out=offsets[1:])
+    counts = np.zeros(offsets[-1], dtype=np.int64 if self.weights is None else np.float64)
+    def count(block):
+      a, b = block
+      counts[offsets[a]:offsets[b]] = _joint_counts(self.data[:, a:b], self.cardinality[a:b],
+                                                    0, 1, self.weights)[1]
+    step = max(1, _BLOCK_SIZE // max(n_observations, 1))
+    _map(count, _column_blocks(n_features, step, n_jobs), n_jobs)
+    return counts
+
+  def resample(self, weights, n_jobs=1):
+    """
+      The same data set with observation i counted weights[i] times,
+      for instance a bootstrap resample.  The states are shared with
+      this data set rather than copied, only the marginal counts are
+      recounted.
+
+        >>> rows = np.random.randint(0, dataset.n_observations, dataset.n_observations)
+        >>> boot = dataset.resample(np.bincount(rows, minlength=dataset.n_observations))
+
+      @param weights: non-negative weight of every observation.
+      @type weights: ndarray
+      @param n_jobs: number of threads counting the marginals.
+      @type n_jobs: integer
+      @rtype: DiscretizedDataset
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    if weights.shape != (self.n_observations,):
+      raise Exception("weights must hold one value per observation.")
+    if weights.min() < 0 or weights.sum() <= 0:
+      raise Exception("weights must be non-negative and not all zero.")
+
+    dataset = self.__class__.__new__(self.__class__)
+    dataset.__dict__.update(self.__dict__)
+    dataset.weights, dataset.n_samples = weights, float(weights.sum())
+    dataset.state_counts = dataset._marginal_counts(n_jobs)
+    dataset.label_counts = np.bincount(self.labels, weights, minlength=self.n_label_states)
+    dataset.label_joint_entropy = dataset.joint_entropies(self.labels, self.n_label_states,
+                                                          n_jobs)
+    dataset._derive()
+    return dataset
+
+  def with_labels(self, labels, n_jobs=1):
+    """
+      The same data set with other labels.  The states and marginal
+      counts of the features are shared with this data set, only the
+      counts involving the labels are made.
+
+      @param labels: labels represented in a numpy list with 
+        n_observations as the number of elements.
+      @type labels: ndarray
+      @param n_jobs: number of threads counting.
+      @type n_jobs: integer
+      @rtype: DiscretizedDataset
+    """
+    if len(labels) != self.n_observations:
+      raise Exception("data and labels must be the same length")
+    dataset = self.__class__.__new__(self.__class__)
+    dataset.__dict__.update(self.__dict__)
+    dataset.labels, dataset.n_label_states = _encode(np.asarray(labels))
+    dataset.label_counts = np.bincount(dataset.labels, self.weights,
+                                       minlength=dataset.n_label_states)
+    dataset.label_joint_entropy = dataset.joint_entropies(dataset.labels,
+                                                          dataset.n_label_states, n_jobs)
+    dataset._derive()
+    return dataset
+
+  def save(self, file):
+    """
+      Write the data set in NumPy's .npz format.
+
+      @param file: file name or open file.
+    """
+    arrays = dict((name, getattr(self, name)) for name in self._saved)
+    if self.weights is not None:
+      arrays["weights"] = self.weights
+    np.savez(file, **arrays)
+
+  @classmethod
+  def load(cls, file):
+    """
+      Read a data set written by L{save}.
+
+      @param file: file name or open file.
+      @rtype: DiscretizedDataset
+    """
+    dataset = cls.__new__(cls)
+    archive = np.load(file)
+    try:
+      for name in cls._saved:
+        setattr(dataset, name, archive[name])
+      if "weights" in archive.files:
+        dataset.weights = archive["weights"]
+    finally:
+      archive.close()
+    dataset._derive()
+    return dataset
+
+  def vector_entropy(self, z, k):
+    """
+      Entropy of a single vector of states 0..k-1.
+    """
+    return _entropy(([0], np.bincount(z, self.weights, minlength=k)), self.n_samples)[0]
+
+  def joint_entropies(self, z, k, n_jobs=1):
+    """
+      Compute H(X_j, Z) for every feature X_j.
+
+      @param z: vector of states 0..k-1, or None for H(X_j).
+      @param k: number of states of z.
+      @param n_jobs: number of threads sharing the columns.
+      @return: joint entropy of every feature with z.
+      @rtype: ndarray
+    """
+    return self._count(z, k, 1, n_jobs)[0]
+
+  def pair_entropies(self, s, n_jobs=1, columns=None):
+    """
+      Compute H(X_j, X_s) and H(X_j, X_s, Y) for every feature X_j
+      from a single pass over the data.
+
+      @param s: index of the feature to pair every feature with.
+      @param n_jobs: number of threads sharing the columns.
+      @param columns: indices of the features X_j to compute them for,
+        or None for all of them.
+      @return (h_jsy, h_js): the two vectors of joint entropies.
+      @rtype: tuple
+    """
+    z = self.column(s) * self.n_label_states + self.labels
+    return self._count(z, int(self.cardinality[s]) * self.n_label_states,
+                       self.n_label_states, n_jobs, columns)
+
+  def pair_entropy(self, s, n_jobs=1, columns=None):
+    """
+      Compute H(X_j, X_s) for every feature X_j, without the labels.
+
+      @param s: index of the feature to pair every feature with.
+      @param n_jobs: number of threads sharing the columns.
+      @param columns: indices of the features X_j to compute it for,
+        or None for all of them.
+      @rtype: ndarray
+    """
+    return self._count(self.column(s), int(self.cardinality[s]), 1, n_jobs, columns)[0]
+
+  def conditional_relevance(self, features, n_jobs=1, columns=None):
+    """
+      Compute I(X_j;Y|X_S) for every feature X_j, where X_S is the
+      joint state of the given features.
+
+      @param features: indices of the features to condition on.
+      @param n_jobs: number of threads sharing the columns.
+      @param columns: indices of the features X_j to compute it for,
+        or None for all of them.
+      @return: conditional mutual information of every feature.
+      @rtype: ndarray
+    """
+    features = [int(f) for f in features]
+    condition = self.column(features[0])
+    n_condition = int(self.cardinality[features[0]])
+    for f in features[1:]:
+      condition, n_condition = self.merge(condition, n_condition, f)
+    joint = condition * self.n_label_states + self.labels
+    n_joint = n_condition * self.n_label_states
+    h_jzy, h_jz = self._count(joint, n_joint, self.n_label_states, n_jobs, columns)
+    return (h_jz + self.vector_entropy(joint, n_joint)
+            - h_jzy - self.vector_entropy(condition, n_condition))
+
+  def column(self, j):
+    """
+      The states of feature j.
+    """
+    return self.data[:, j].astype(np.int64)
+
+  def _rows(self, z, k, collapse):
+    """
+      The observations worth counting jointly with z.  An observation
+      whose (coarse) state of z occurs only once sits alone in its cell
+      of every table and adds nothing to sum c*log(c), so it is left
+      out of the counts.  When conditioning on many features at once
+      this drops most of the observations.  So do observations of
+      weight zero.
+
+      @return (rows, z, k, weights): the rows kept, or None for all of
+        them, and z, k and the weights restricted to those rows.
+      @rtype: tuple
+    """
+    z = np.asarray(z, dtype=np.int64)
+    weights = self.weights
+    occupancy = np.bincount(z // collapse, weights, minlength=k // collapse)
+    keep = occupancy[z // collapse] > 1
+    if weights is not None:
+      keep &= weights > 0
+    if 8*keep.sum() >= 7*len(z):
+      return None, z, k, weights
+    rows = np.flatnonzero(keep)
+    states, k_coarse = _compact(z[rows] // collapse, k // collapse)
+    z = states * collapse + z[rows] % collapse
+    k = max(k_coarse, 1) * collapse
+    if weights is not None:
+      weights = weights[rows]
+    return rows, z, k, weights
+
+  def _count(self, z, k, collapse, n_jobs=1, columns=None):
+    """
+      Joint entropies of every feature with z, and with z // collapse
+      when collapse > 1.  The coarser table is obtained by summing
+      neighbouring bins of the finer one rather than by recounting.
+      Blocks of columns are counted independently, on n_jobs threads.
+      Only the features in columns are counted when it is given.
+    """
+    n_observations = self.data.shape[0]
+    if columns is not None:
+      columns = np.asarray(columns, dtype=np.int64)
+    cardinality = self.cardinality if columns is None else self.cardinality[columns]
+    entropies = np.empty(len(cardinality))
+    coarse = np.empty(len(cardinality))
+    rows, weights = None, self.weights
+    if z is None:
+      z = np.zeros(1, dtype=np.int64)
+    else:
+      rows, z, k, weights = self._rows(z, k, collapse)
+      z = z[:, None]
+
+    def count(block):
+      a, b = block
+      block_columns = slice(a, b) if columns is None else columns[a:b]
+      if rows is None:
+        states = self.data[:, block_columns]
+      elif columns is None:
+        states = self.data[rows, a:b]
+      else:
+        states = self.data[np.ix_(rows, block_columns)]
+      offsets, counts = _joint_counts(states, cardinality[a:b], z, k, weights)
+      entropies[a:b] = _entropy((offsets, counts), self.n_samples)
+      if collapse > 1:
+        counts = counts.reshape(-1, collapse).sum(axis=1)
+        coarse[a:b] = _entropy((offsets // collapse, counts), self.n_samples)
+
+    n_rows = n_observations if rows is None else len(rows)
+    step = _block_step(n_rows, cardinality, k)
+    _map(count, _column_blocks(len(cardinality), step, n_jobs), n_jobs)
+    return entropies, coarse
+
+  def joint_counts(self, z, k, rows=None, n_jobs=1):
+    """
+      The joint counts of every feature with z, as one flat table.
+      The counts of feature j start at offsets[j], and state x of X_j
+      with state z of Z is counted at offsets[j] + x*k + z.  Unlike the
+      entropies, the tables of different observations can be added
+      and subtracted.
+
+      @param z: vector of states 0..k-1.
+      @param k: number of states of z.
+      @param rows: the observations to count, or None for all of them.
+      @param n_jobs: number of threads sharing the columns.
+      @return (offsets, counts): where the counts of each feature
+        start, and the count table.
+      @rtype: tuple
+    """
+    n_features = self.data.shape[1]
+    offsets = np.zeros(n_features + 1, dtype=np.int64)
+    np.cumsum(self.cardinality * k, out=offsets[1:])
+    counts = np.zeros(offsets[-1], dtype=np.int64 if self.weights is None else np.float64)
+    z, weights = np.asarray(z, dtype=np.int64), self.weights
+    if rows is not None:
+      z = z[rows]
+      if weights is not None:
+        weights = weights[rows]
+    z = z[:, None]
+
+    def count(block):
+      a, b = block
+      states = self.data[:, a:b] if rows is None else self.data[rows, a:b]
+      counts[offsets[a]:offsets[b]] = _joint_counts(states, self.cardinality[a:b], z, k,
+                                                    weights)[1]
+
+    step = _block_step(len(z), self.cardinality, k)
+    _map(count, _column_blocks(n_features, step, n_jobs), n_jobs)
+    return offsets[:-1], counts
+
+  def merge(self, z, k, j):
+    """
+      Joint state of the vector z (states 0..k-1) and feature j.
+
+      @return (states, k): the merged states and their number.
+      @rtype: tuple
+    """
+    codes = np.asarray(z, dtype=np.int64) * int(self.cardinality[j])
+    codes += self.column(j)
+    return _compact(codes, k * int(self.cardinality[j]))
+
+
+class SparseDataset(DiscretizedDataset):
+  """
+    A L{DiscretizedDataset} of a scipy.sparse matrix, such as a table
+    of OTU counts that is mostly zeros.  Only the nonzero states are
+    stored, in compressed columns, and zero is a state of its own
+    whose counts are whatever the nonzero states leave over.  Counting
+    takes time and memory in proportion to the number of nonzeros
+    rather than to n_observations x n_features, and the selections
+    are the same as for the dense data.
+
+    Sparse matrices passed to a selector are wrapped in a SparseDataset
+    automatically.
+
+      >>> dataset = SparseDataset(scipy.sparse.csc_matrix(data), labels)
+      >>> JMI(dataset, None, 10)
+
+    @ivar data: the states, as a scipy.sparse.csc_matrix.  State 0 is
+      zero.
+  """
+
+  _saved = ("states", "indices", "indptr", "n_observations", "labels", "n_label_states",
+            "cardinality", "state_counts", "label_counts", "label_joint_entropy")
+
+  def __init__(self, data, labels, n_jobs=1):
+    """
+      @param data: n_observations x n_features sparse matrix.
+      @type data: scipy.sparse matrix
+      @param labels: labels represented in a numpy list with 
+        n_observations as the number of elements.
+      @type labels: ndarray
+      @param n_jobs: number of threads counting.
+      @type n_jobs: integer
+    """
+    if not _is_sparse(data):
+      raise Exception("data must be a scipy.sparse matrix.")
+    if isinstance(labels, np.ndarray) is False:
+      raise Exception("labels must be an numpy ndarray.")
+    if data.shape[0] != len(labels):
+      raise Exception("data and labels must be the same length")
+    data = data.tocsc()
+    data.sum_duplicates()
+    self.n_observations, n_features = data.shape
+    self.labels, self.n_label_states = _encode(labels)
+
+    # values are floored like the dense data, and those that floor to
+    # zero are in the zero state
+    values = data.data
+    if _is_integer(values):
+      values = values.astype(np.int64)
+    else:
+      values = np.floor(values)
+    columns = np.repeat(np.arange(n_features), np.diff(data.indptr))
+    nonzero = values != 0
+    values, columns, rows = values[nonzero], columns[nonzero], data.indices[nonzero]
+
+    # number the distinct values of each column 1, 2, ...
+    order = np.lexsort((values, columns))
+    new = np.ones(len(order), dtype=bool)
+    new[1:] = ((columns[order][1:] != columns[order][:-1]) |
+               (values[order][1:] != values[order][:-1]))
+    n_values = np.bincount(columns[order][new], minlength=n_features)
+    first = np.cumsum(n_values) - n_values
+    states = np.empty(len(order), dtype=np.int64)
+    states[order] = np.cumsum(new) - first[columns[order]]
+    self.cardinality = n_values.astype(np.int64) + 1
+
+    self.states = states.astype(_state_dtype(int(self.cardinality.max(initial=1))))
+    self.indices = rows.astype(np.int64)
+    self.indptr = np.zeros(n_features + 1, dtype=np.int64)
+    np.cumsum(np.bincount(columns, minlength=n_features), out=self.indptr[1:])
+    self.data = self._matrix()
+
+    self.n_samples = self.n_observations
+    self.state_counts = self._marginal_counts(n_jobs)
+    self.label_counts = np.bincount(self.labels, minlength=self.n_label_states)
+    self.label_joint_entropy = self.joint_entropies(self.labels, self.n_label_states, n_jobs)
+    self._derive()
+
+  def _matrix(self):
+    """
+      The states as a scipy.sparse.csc_matrix, sharing the arrays.
+    """
+    import scipy.sparse
+    return scipy.sparse.csc_matrix((self.states, self.indices, self.indptr),
+                                   shape=(int(self.n_observations), len(self.indptr) - 1))
+
+  def _derive(self):
+    """
+      Fill in everything that follows from the saved attributes.
+    """
+    if not hasattr(self, "data"):
+      self.data = self._matrix()
+    DiscretizedDataset._derive(self)
+
+  def column(self, j):
+    """
+      The states of feature j, zeros included.
+    """
+    column = np.zeros(self.n_observations, dtype=np.int64)
+    a, b = self.indptr[j], self.indptr[j + 1]
+    column[self.indices[a:b]] = self.states[a:b]
+    return column
+
+  def _marginal_counts(self, n_jobs=1):
+    """
+      Count the states of every feature in one pass over the nonzeros.
+    """
+    n_features = len(self.indptr) - 1
+    offsets = np.zeros(n_features, dtype=np.int64)
+    np.cumsum(self.cardinality[:-1], out=offsets[1:])
+    columns = np.repeat(np.arange(n_features), np.diff(self.indptr))
+    weights = None if self.weights is None else self.weights[self.indices]
+    counts = np.bincount(offsets[columns] + self.states, weights,
+                         minlength=int(self.cardinality.sum()))
+    if self.weights is None:
+      counts = counts.astype(np.int64)
+    n_samples = self.n_observations if self.weights is None else self.weights.sum()
+    counts[offsets] = n_samples - np.add.reduceat(counts, offsets)
+    return counts
+
+  def joint_counts(self, z, k, rows=None, n_jobs=1):
+    """
+      The joint counts of every feature with z, see
+      L{DiscretizedDataset.joint_counts}.
+    """
+    n_features = len(self.indptr) - 1
+    offsets = np.zeros(n_features, dtype=np.int64)
+    np.cumsum(self.cardinality[:-1] * k, out=offsets[1:])
+    z = np.asarray(z, dtype=np.int64)
+    columns = np.repeat(np.arange(n_features), np.diff(self.indptr))
+    observations, states = self.indices, self.states.astype(np.int64)
+    if rows is None:
+      z_counts = np.bincount(z, self.weights, minlength=k)
+    else:
+      counted = np.zeros(self.n_observations, dtype=bool)
+      counted[rows] = True
+      kept = counted[observations]
+      columns, observations, states = columns[kept], observations[kept], states[kept]
+      weights = None if self.weights is None else self.weights[rows]
+      z_counts = np.bincount(z[rows], weights, minlength=k)
+    weights = None if self.weights is None else self.weights[observations]
+    counts = np.bincount(offsets[columns] + states * k + z[observations], weights,
+                         minlength=int((self.cardinality * k).sum()))
+    nonzero = np.bincount(columns * k + z[observations], weights, minlength=n_features * k)
+    counts[offsets[:, None] + np.arange(k)] = z_counts - nonzero.reshape(n_features, k)
+    return offsets, counts
+
+  def _count(self, z, k, collapse, n_jobs=1, columns=None):
+    """
+      Joint entropies of every feature with z, and with z // collapse
+      when collapse > 1, see L{DiscretizedDataset._count}.  The joint
+      counts of the nonzero states are counted from the nonzeros, and
+      those of the zero state follow from the counts of z.
+    """
+    if columns is None:
+      columns = np.arange(len(self.indptr) - 1)
+    columns = np.asarray(columns, dtype=np.int64)
+    cardinality = self.cardinality[columns]
+    lengths = self.indptr[columns + 1] - self.indptr[columns]
+    entropies = np.empty(len(columns))
+    coarse = np.empty(len(columns))
+    if z is None:
+      rows, z, k, weights = None, np.zeros(self.n_observations, dtype=np.int64), 1, self.weights
+    else:
+      rows, z, k, weights = self._rows(z, k, collapse)
+    z_counts = np.bincount(z, weights, minlength=k)
+    if rows is not None:
+      # the state of z of every observation, -1 for those left out
+      z_all = -np.ones(self.n_observations, dtype=np.int64)
+      z_all[rows] = z
+      z = z_all
+
+    def count(block):
+      a, b = block
+      # positions of the nonzeros of the block's columns, one column
+      # after another
+      ends = np.cumsum(lengths[a:b])
+      nonzeros = np.arange(ends[-1] if b > a else 0)
+      nonzeros += np.repeat(self.indptr[columns[a:b]] - ends + lengths[a:b], lengths[a:b])
+      observations = self.indices[nonzeros]
+      block_columns = np.repeat(np.arange(b - a), lengths[a:b])
+      states = self.states[nonzeros].astype(np.int64)
+      z_nonzero = z[observations]
+      w = None if self.weights is None else self.weights[observations]
+      if rows is not None:
+        kept = z_nonzero >= 0
+        block_columns, states = block_columns[kept], states[kept]
+        z_nonzero = z_nonzero[kept]
+        w = None if w is None else w[kept]
+
+      width = cardinality[a:b] * k
+      offsets = np.zeros(b - a, dtype=np.int64)
+      np.cumsum(width[:-1], out=offsets[1:])
+      counts = np.bincount(offsets[block_columns] + states * k + z_nonzero, w,
+                           minlength=int(width.sum()))
+      nonzero = np.bincount(block_columns * k + z_nonzero, w, minlength=(b - a) * k)
+      zeros = offsets[:, None] + np.arange(k)
+      counts[zeros] = z_counts - nonzero.reshape(b - a, k)
+      entropies[a:b] = _entropy((offsets, counts), self.n_samples)
+      if collapse > 1:
+        counts = counts.reshape(-1, collapse).sum(axis=1)
+        coarse[a:b] = _entropy((offsets // collapse, counts), self.n_samples)
+
+    per_column = max(1, int(lengths.sum()) // max(len(columns), 1))
+    step = _block_step(per_column, cardinality, k)
+    _map(count, _column_blocks(len(columns), step, n_jobs), n_jobs)
+    return entropies, coarse
+
+
+class ChunkedDataset(object):
+  """
+    Data that is read a block of rows at a time, for matrices that do
+    not fit in memory.  Every greedy step makes one pass over the rows,
+    adding the joint counts of each block to count tables for all
+    features, so memory is bounded by one block of rows plus the count
+    tables.  The selections are the same as for the data in memory.
+
+    The source may be a numpy array or np.memmap, the path of a .npy
+    file (which is memory mapped), or a function returning a fresh
+    iterator over blocks of rows each time it is called.  Every greedy
+    step reads the rows again, so a bare iterator or generator, which
+    can only be read once, is refused: wrap it in a function that
+    makes a new one.  The labels are held in memory.  Pass the data
+    set to MIM, mRMR, JMI, CMIM, DISR, ICAP or BetaGamma in place of
+    the data:
+
+      >>> dataset = ChunkedDataset("otus.npy", labels, chunk_size=50000)
+      >>> dataset = ChunkedDataset(lambda: read_blocks("otus.tsv"), labels)
+      >>> JMI(dataset, None, 10)
+
+    Values are floored and offset by the smallest value of their column
+    as in MIToolbox, so the range of every column has to be small.
+    CondMI, which conditions on the joint state of all selected
+    features, needs the data in memory.
+  """
+
+  def __init__(self, source, labels, chunk_size=10000, n_jobs=1):
+    """
+      @param source: the data, n_observations x n_features.
+      @type source: ndarray, string or callable
+      @param labels: labels represented in a numpy list with 
+        n_observations as the number of elements.
+      @type labels: ndarray
+      @param chunk_size: number of rows read at once from an array
+        or a .npy file.
+      @type chunk_size: integer
+      @param n_jobs: number of threads counting the relevance.
+      @type n_jobs: integer
+    """
+    if isinstance(source, str):
+      source = np.load(source, mmap_mode="r")
+    if not isinstance(source, np.ndarray) and not callable(source):
+      raise Exception("source must be a callable returning a fresh iterator of row chunks")
+    if isinstance(labels, np.ndarray) is False:
+      raise Exception("labels must be an numpy ndarray.")
+    self.source = source
+    self.chunk_size = chunk_size
+    self.labels, self.n_label_states = _encode(labels)
+
+    # first pass: the range of every column
+    lo, hi, n_observations = None, None, 0
+    for chunk in self._blocks():
+      chunk_lo, chunk_hi = np.floor(chunk.min(axis=0)), np.floor(chunk.max(axis=0))
+      lo = chunk_lo if lo is None else np.minimum(lo, chunk_lo)
+      hi = chunk_hi if hi is None else np.maximum(hi, chunk_hi)
+      n_observations += len(chunk)
+    if n_observations != len(self.labels):
+      raise Exception("data and labels must be the same length")
+    if (hi - lo).max() >= max(4*n_observations, 1 << 16):
+      raise Exception("the range of a column is too large, discretize the data first.")
+    self.n_observations, self.n_features = n_observations, len(lo)
+    self.shape = (self.n_observations, self.n_features)
+    self.minimum = lo.astype(np.int64)
+    self.cardinality = (hi - lo).astype(np.int64) + 1
+
+    # second pass: H(X_j,Y), from which H(X_j) follows
+    self.label_entropy = _entropy(([0], np.bincount(self.labels)), n_observations)[0]
+    self.label_joint_entropy, self.entropy = self._count(lambda start, states:
+        self.labels[start:start + len(states)], self.n_label_states, self.n_label_states,
+        n_jobs)
+    self.relevance = self.entropy + self.label_entropy - self.label_joint_entropy
+
+  def _blocks(self):
+    """
+      Iterate over the blocks of rows of the source.
+    """
+    if isinstance(self.source, np.ndarray):
+      for a in range(0, len(self.source), self.chunk_size):
+        yield self.source[a:a + self.chunk_size]
+    else:
+      for chunk in self.source():
+        yield np.asarray(chunk)
+
+  def _states(self):
+    """
+      Iterate over (first row, states) of the blocks of rows.
+    """
+    start = 0
+    for chunk in self._blocks():
+      if _is_integer(chunk):
+        states = chunk.astype(np.int64)
+      else:
+        states = np.floor(chunk).astype(np.int64)
+      states -= self.minimum
+      yield start, states
+      start += len(states)
+
+  def pair_entropies(self, s, n_jobs=1, columns=None):
+    """
+      H(X_j,X_s,Y) and H(X_j,X_s) for every feature X_j, see
+      L{DiscretizedDataset.pair_entropies}.  Every feature is counted,
+      whatever columns holds.
+    """
+    s = int(s)
+    n_label_states = self.n_label_states
+    def z(start, states):
+      return states[:, s] * n_label_states + self.labels[start:start + len(states)]
+    h_jsy, h_js = self._count(z, int(self.cardinality[s]) * n_label_states, n_label_states,
+                              n_jobs)
+    if columns is None:
+      return h_jsy, h_js
+    return h_jsy[columns], h_js[columns]
+
+  def pair_entropy(self, s, n_jobs=1, columns=None):
+    """
+      H(X_j,X_s) for every feature X_j, see
+      L{DiscretizedDataset.pair_entropy}.  Every feature is counted,
+      whatever columns holds.
+    """
+    s = int(s)
+    h_js = self._count(lambda start, states: states[:, s], int(self.cardinality[s]), 1,
+                       n_jobs)[0]
+    return h_js if columns is None else h_js[columns]
+
+  def conditional_relevance(self, features, n_jobs=1, columns=None):
+    """
+      I(X_j;Y|X_s) for every feature X_j, for a single feature s.  Every
+      feature is counted, whatever columns holds, since each pass
+      over the rows costs the same.
+    """
+    if len(features) != 1:
+      raise Exception("CondMI is not available for a ChunkedDataset.")
+    s = int(features[0])
+    h_jsy, h_js = self.pair_entropies(s, n_jobs)
+    relevance = h_js + self.label_joint_entropy[s] - h_jsy - self.entropy[s]
+    return relevance if columns is None else relevance[columns]
+
+  def _count(self, z, k, collapse, n_jobs=1):
+    """
+      Accumulate the joint counts of every feature with z over all
+      blocks of rows, and return the joint entropies with z and with
+      z // collapse.  The columns of each block of rows are shared out
+      between n_jobs threads.
+
+      @param z: function of (first row, states) giving z on a block.
+    """
+    width = self.cardinality * k
+    offsets = np.zeros(self.n_features + 1, dtype=np.int64)
+    np.cumsum(width, out=offsets[1:])
+    counts = np.zeros(offsets[-1], dtype=np.int64)
+    for start, states in self._states():
+      block_z = np.asarray(z(start, states), dtype=np.int64)[:, None]
+      def count(block):
+        a, b = block
+        counts[offsets[a]:offsets[b]] += _joint_counts(states[:, a:b],
+            self.cardinality[a:b], block_z, k)[1]
+      step = _block_step(len(states), self.cardinality, k)
+      _map(count, _column_blocks(self.n_features, step, n_jobs), n_jobs)
+    offsets = offsets[:-1]
+    coarse = counts.reshape(-1, collapse).sum(axis=1)
+    return (_entropy((offsets, counts), self.n_observations),
+            _entropy((offsets // collapse, coarse), self.n_observations))
+
+
+class PartialCounts(object):
+  """
+    What one shard of the rows of a data set adds to the count tables
+    of the whole, as made by L{count_shard}.  The counts of the shards
+    of a data set add up with L{merge}, so shards can be counted by
+    different processes or machines and merged where the selection
+    runs.  A PartialCounts pickles, or can be written with L{save} and
+    read back with L{load}.
+
+    The first pass over the shards finds the range of every column and
+    the label values, and no tables.  Merged over all shards, that is
+    the layout in which the tables of every further pass are counted.
+
+    @ivar n_observations: number of rows counted.
+    @ivar minimum: smallest floored value of every column.
+    @ivar maximum: largest floored value of every column.
+    @ivar label_values: the distinct floored labels, sorted.
+    @ivar tables: the count tables by key, see L{count_shard}.  The
+      table of each feature follows that of the one before.
+  """
+
+  def __init__(self, n_observations, minimum, maximum, label_values, tables=None):
+    self.n_observations = n_observations
+    self.minimum = minimum
+    self.maximum = maximum
+    self.label_values = label_values
+    self.tables = {} if tables is None else tables
+
+  def merge(self, other):
+    """
+      The counts of the rows of both, which are counted in the same
+      layout unless they come from a first pass.
+
+      @type other: PartialCounts
+      @rtype: PartialCounts
+    """
+    tables = dict(self.tables)
+    for key, counts in other.tables.items():
+      tables[key] = counts if key not in tables else tables[key] + counts
+    return PartialCounts(self.n_observations + other.n_observations,
+                         np.minimum(self.minimum, other.minimum),
+                         np.maximum(self.maximum, other.maximum),
+                         np.union1d(self.label_values, other.label_values), tables)
+
+  def layout(self):
+    """
+      The same ranges and label values without any table, which is all
+      a worker needs to count in this layout.
+
+      @rtype: PartialCounts
+    """
+    return PartialCounts(self.n_observations, self.minimum, self.maximum, self.label_values)
+
+  def save(self, file):
+    """
+      Write the counts in NumPy's compressed .npz format, each table
+      with the smallest unsigned type that holds it.
+
+      @param file: file name or open file.
+    """
+    arrays = {"n_observations": self.n_observations, "minimum": self.minimum,
+              "maximum": self.maximum, "label_values": self.label_values}
+    for key, counts in self.tables.items():
+      arrays["table_" + str(key)] = counts.astype(np.min_scalar_type(counts.max(initial=0)))
+    np.savez_compressed(file, **arrays)
+
+  @classmethod
+  def load(cls, file):
+    """
+      Read counts written by L{save}.
+
+      @param file: file name or open file.
+      @rtype: PartialCounts
+    """
+    archive = np.load(file)
+    try:
+      tables = {}
+      for name in archive.files:
+        if name.startswith("table_"):
+          key = name[len("table_"):]
+          tables[key if key == "labels" else int(key)] = archive[name].astype(np.int64)
+      return cls(int(archive["n_observations"]), archive["minimum"], archive["maximum"],
+                 archive["label_values"], tables)
+    finally:
+      archive.close()
+
+
+def count_shard(shard, layout=None, keys=()):
+  """
+    Count one shard of the rows of a data set, the work a worker does
+    for a L{ShardedDataset}.  Values are floored as in MIToolbox.
+    Without a layout, only the range of every column and the label
+    values are found.
+
+    @param shard: (data, labels) of the rows of the shard, each an
+      array or the path of a .npy file, which is memory mapped.
+    @type shard: tuple
+    @param layout: the merged counts of the first pass over all of
+      the shards, or None for the first pass.
+    @type layout: PartialCounts
+    @param keys: the tables to count: "labels" for every feature
+      jointly with the labels, or the index s of a feature for every
+      feature jointly with X_s and the labels.
+    @rtype: PartialCounts
+  """
+  data, labels = [np.load(part, mmap_mode="r") if isinstance(part, str) else np.asarray(part)
+                  for part in shard]
+  if data.ndim != 2 or len(data) != len(labels):
+    raise Exception("a shard must hold data and labels of the same length.")
+  data = data if _is_integer(data) else np.floor(data)
+  labels = labels if _is_integer(labels) else np.floor(labels)
+  if layout is None:
+    if len(data) == 0:
+      raise Exception("a shard must hold at least one row.")
+    return PartialCounts(len(data), data.min(axis=0).astype(np.int64),
+                         data.max(axis=0).astype(np.int64), np.unique(labels))
+
+  states = np.asarray(data, dtype=np.int64) - layout.minimum
+  labels = np.searchsorted(layout.label_values, labels)
+  cardinality = layout.maximum - layout.minimum + 1
+  n_label_states = len(layout.label_values)
+  tables = {}
+  for key in keys:
+    if key == "labels":
+      z, k = labels, n_label_states
+    else:
+      z, k = states[:, key] * n_label_states + labels, int(cardinality[key]) * n_label_states
+    tables[key] = _joint_counts(states, cardinality, z[:, None], k)[1]
+  return PartialCounts(len(data), layout.minimum, layout.maximum, layout.label_values, tables)
+
+
+def _count_shard(job):
+  """
+    count_shard(*job), for maps that pass a single argument.
+  """
+  return count_shard(*job)
+
+
+class ShardedDataset(object):
+  """
+    A data set stored as shards of rows, in several files or on
+    several machines, that is never put together.  Each greedy step
+    has every shard counted on its own, by L{count_shard}, and the
+    L{PartialCounts} merged.  The shards are counted with map, which
+    may be the map of a multiprocessing.Pool or of anything else that
+    runs a function over a list, such as a cluster's client, as long
+    as the shards can be read where it runs.  Pass the data set to
+    MIM, mRMR, JMI, CMIM, DISR, ICAP or BetaGamma in place of the data:
+
+      >>> pool = multiprocessing.Pool(4)
+      >>> dataset = ShardedDataset([("part0.npy", "labels0.npy"),
+      ...                           ("part1.npy", "labels1.npy")], map=pool.map)
+      >>> JMI(dataset, None, 10)
+
+    As with L{ChunkedDataset}, values are floored and offset by the
+    smallest value of their column, so the range of every column has
+    to be small, and CondMI is not available.  The selections are the
+    same as for the rows put together.
+  """
+
+  def __init__(self, shards, map=map):
+    """
+      @param shards: (data, labels) of every shard, see L{count_shard}.
+      @type shards: list
+      @param map: runs a function over a list and returns the results
+        in order, the builtin map by default.
+    """
+    self.shards = list(shards)
+    self._map_function = map
+    first = self._merge([(shard,) for shard in self.shards])
+    self.layout = first.layout()
+    self.n_observations, self.n_features = first.n_observations, len(first.minimum)
+    self.shape = (self.n_observations, self.n_features)
+    self.cardinality = first.maximum - first.minimum + 1
+    if self.cardinality.max(initial=1) >= max(4*self.n_observations, 1 << 16):
+      raise Exception("the range of a column is too large, discretize the data first.")
+    self.n_label_states = len(first.label_values)
+
+    # H(X_j,Y), from which H(X_j) and H(Y) follow
+    counts = self._merge([(shard, self.layout, ["labels"]) for shard in self.shards])
+    label_joint = counts.tables["labels"]
+    self.label_joint_entropy, self.entropy = self._entropies(label_joint, self.n_label_states,
+                                                             self.n_label_states)
+    label_counts = label_joint[:self.cardinality[0] * self.n_label_states]
+    label_counts = label_counts.reshape(-1, self.n_label_states).sum(axis=0)
+    self.label_entropy = _entropy(([0], label_counts), self.n_observations)[0]
+    self.relevance = self.entropy + self.label_entropy - self.label_joint_entropy
+
+  def pair_entropies(self, s, n_jobs=1, columns=None):
+    """
+      H(X_j,X_s,Y) and H(X_j,X_s) for every feature X_j, see
+      L{DiscretizedDataset.pair_entropies}.  Every feature is counted,
+      whatever columns holds.
+    """
+    s = int(s)
+    counts = self._merge([(shard, self.layout, [s]) for shard in self.shards])
+    h_jsy, h_js = self._entropies(counts.tables[s], int(self.cardinality[s]) *
+                                  self.n_label_states, self.n_label_states)
+    if columns is None:
+      return h_jsy, h_js
+    return h_jsy[columns], h_js[columns]
+
+  def pair_entropy(self, s, n_jobs=1, columns=None):
+    """
+      H(X_j,X_s) for every feature X_j, see
+      L{DiscretizedDataset.pair_entropy}.
+    """
+    return self.pair_entropies(s, n_jobs, columns)[1]
+
+  def conditional_relevance(self, features, n_jobs=1, columns=None):
+    """
+      I(X_j;Y|X_s) for every feature X_j, for a single feature s.
+    """
+    if len(features) != 1:
+      raise Exception("CondMI is not available for a ShardedDataset.")
+    s = int(features[0])
+    h_jsy, h_js = self.pair_entropies(s, n_jobs)
+    relevance = h_js + self.label_joint_entropy[s] - h_jsy - self.entropy[s]
+    return relevance if columns is None else relevance[columns]
+
+  def _merge(self, jobs):
+    """
+      Count the shards and merge their counts.
+    """
+    merged = None
+    for counts in self._map_function(_count_shard, jobs):
+      merged = counts if merged is None else merged.merge(counts)
+    return merged
+
+  def _entropies(self, counts, k, collapse):
+    """
+      The entropies of a table of every feature jointly with a
+      variable of k states, and with that variable // collapse.
+    """
+    offsets = np.zeros(self.n_features, dtype=np.int64)
+    np.cumsum(self.cardinality[:-1] * k, out=offsets[1:])
+    coarse = counts.reshape(-1, collapse).sum(axis=1)
+    return (_entropy((offsets, counts), self.n_observations),
+            _entropy((offsets // collapse, coarse), self.n_observations))
+
+
+def _numpy_select(algorithm, data, labels, n_select, beta=1.0, gamma=1.0, cache=None,
+                  n_jobs=1, resume_from=None, stop=None, fast=False, callback=None,
+                  tolerance=None):
+  """
+    Run one of the selectors on the NumPy backend.  This is a drop in
+    replacement for the libFSToolbox call and follows its greedy
+    search step by step, so the features come back in the same order.
+
+    @param algorithm: one of "BetaGamma", "CMIM", "CondMI", "DISR",
+      "ICAP", "JMI", "MIM" or "mRMR".
+    @param cache: optional L{MICache} built from data and labels.
+    @param n_jobs: number of threads scoring the candidates.
+    @param resume_from: a L{Selection} to carry on from.
+    @param stop: an optional L{EarlyStop}.
+    @param fast: True for the lazy form of CMIM.
+    @param callback: called after every step, see L{JMI}.
+    @param tolerance: for the approximate search, see L{JMI}.
+    @return: features in the order they were selected, or a list of
+      them for each column of 2-D labels.
+    @rtype: L{Selection}
+  """
+  if np.ndim(labels) == 2:
+    return _multi_target(algorithm, data, labels, n_select, beta, gamma, cache, n_jobs,
+                         resume_from, stop, fast, callback, tolerance)
+  started = time.time()
+  state = _resume_state(resume_from)
+  if cache is None:
+    terms = _dataset(data, labels, n_jobs)
+  else:
+    terms = cache
+    if getattr(data, "shape", None) != terms.shape:
+      raise Exception("cache was built from data of a different shape.")
+  converted = time.time() - started
+  selection = _greedy(terms, algorithm, n_select, beta, gamma, n_jobs, state, stop, fast,
+                      callback, tolerance)
+  if selection.timings is not None:
+    selection.timings["convert"] = converted
+  return selection
+
+
+def _resume_state(resume_from):
+  """
+    The L{_SearchState} of resume_from, or None to start afresh.
+  """
+  if resume_from is None:
+    return None
+  state = getattr(resume_from, "state", None)
+  if state is None:
+    raise Exception("resume_from must be a complete selection returned by the NumPy backend.")
+  return state
+
+
+def _multi_target(algorithm, data, labels, n_select, beta=1.0, gamma=1.0, cache=None,
+                  n_jobs=1, resume_from=None, stop=None, fast=False, callback=None,
+                  tolerance=None):
+  """
+    Run one of the selectors for every column of 2-D labels.  The data
+    is encoded once, and the terms without the labels, H(X_j) and
+    H(X_j,X_s), are computed once for all of the targets.  Only the
+    terms involving the labels are counted for each target.  The
+    targets run on n_jobs threads.
+
+    @param resume_from: one L{Selection} for each target, or None.
+    @param callback: called after every step, with the "target" added
+      to the dict.
+    @return: the selection of every target, in the order of the
+      columns of labels.
+    @rtype: list
+  """
+  if cache is not None:
+    raise Exception("cache cannot be used with 2-D labels.")
+  if _is_data_set(data):
+    raise Exception("2-D labels need the data as an array.")
+  started = time.time()
+  labels = np.asarray(labels)
+  n_targets = labels.shape[1]
+  if resume_from is None:
+    resume_from = [None] * n_targets
+  elif len(resume_from) != n_targets:
+    raise Exception("resume_from must hold one selection for each target.")
+  dataset = _dataset(data, labels[:, 0], n_jobs)
+  pairs, lock = {}, threading.Lock()
+  converted = time.time() - started
+
+  def run(t):
+    began = time.time()
+    target = _Target(dataset.with_labels(labels[:, t]) if t > 0 else dataset, pairs, lock)
+    labelled = time.time()
+    report = None
+    if callback is not None:
+      report = lambda event: callback(dict(event, target=t))
+    selection = _greedy(target, algorithm, n_select, beta, gamma, 1,
+                        _resume_state(resume_from[t]), stop, fast, report, tolerance)
+    if selection.timings is not None:
+      selection.timings["convert"] = converted + labelled - began
+    return selection
+  return _map(run, range(n_targets), n_jobs)
+
+
+class _Target(object):
+  """
+    A data set with one of several targets as its labels.  H(X_j,X_s)
+    does not involve the labels, and is kept in pairs, a dict shared
+    by all of the targets, the first time one of them needs it.
+  """
+
+  def __init__(self, dataset, pairs, lock):
+    self.dataset = dataset
+    self._pairs = pairs
+    self._lock = lock
+    for name in ("n_observations", "n_features", "shape", "relevance", "entropy",
+                 "label_entropy", "label_joint_entropy"):
+      setattr(self, name, getattr(dataset, name))
+
+  def _shared(self, s):
+    with self._lock:
+      return self._pairs.get(s)
+
+  def _share(self, s, h_js):
+    with self._lock:
+      self._pairs.setdefault(s, h_js)
+
+  def pair_entropy(self, s, n_jobs=1, columns=None):
+    s = int(s)
+    h_js = self._shared(s)
+    if h_js is None:
+      h_js = self.dataset.pair_entropy(s, n_jobs)
+      self._share(s, h_js)
+    return h_js if columns is None else h_js[columns]
+
+  def pair_entropies(self, s, n_jobs=1, columns=None):
+    s = int(s)
+    dataset = self.dataset
+    n_label_states = dataset.n_label_states
+    z = dataset.column(s) * n_label_states + dataset.labels
+    k = int(dataset.cardinality[s]) * n_label_states
+    h_js = self._shared(s)
+    if h_js is None:
+      h_jsy, h_js = dataset._count(z, k, n_label_states, n_jobs)
+      self._share(s, h_js)
+    else:
+      h_jsy = dataset._count(z, k, 1, n_jobs)[0]
+    if columns is None:
+      return h_jsy, h_js
+    return h_jsy[columns], h_js[columns]
+
+  def conditional_relevance(self, features, n_jobs=1, columns=None):
+    return self.dataset.conditional_relevance(features, n_jobs, columns)
+
+
+def _greedy(terms, algorithm, n_select, beta=1.0, gamma=1.0, n_jobs=1, state=None,
+            stop=None, fast=False, callback=None, tolerance=None):
+  """
+    Greedy forward search shared by all of the NumPy selectors.  Each
+    step scores every feature against the feature selected last, all
+    features at once.
+
+    @param terms: a L{DiscretizedDataset} or an L{MICache}.
+    @param state: the L{_SearchState} of an earlier search to carry on
+      from, or None to start afresh.
+    @param stop: an L{EarlyStop} that may end the search early.
+    @param fast: score CMIM lazily, see L{_update_cmim}.
+    @param callback: called with a dict describing each step.
+    @param tolerance: search approximately, see L{_halving_step}.
+    @rtype: L{Selection}
+  """
+  if algorithm not in _ALGORITHMS:
+    raise Exception("unknown algorithm " + str(algorithm))
+  if n_select > terms.n_features:
+    raise Exception("n_select must not be larger than the number of features.")
+  pairwise = _pairwise_only(terms)
+  if algorithm == "CondMI" and pairwise is not None:
+    # fail now rather than after a pass over the data for step one
+    raise Exception("CondMI is not available for a %s." % type(pairwise).__name__)
+
+  relevance = terms.relevance
+
+  output = -np.ones(n_select)
+  selected = np.zeros(terms.n_features, dtype=bool)
+  total = np.zeros(terms.n_features)
+  score = relevance.copy()
+  scores = []
+  start, exhausted = 0, False
+  # for fast CMIM, the number of selected features each score has seen
+  seen = np.zeros(terms.n_features, dtype=np.int64) if fast else None
+  skipped = 0
+  # for the approximate search, the variance of the part of each
+  # total that was estimated on subsets rather than counted
+  variance, samples = None, None
+  if tolerance is not None:
+    samples = _Samples(terms, algorithm, tolerance)
+    variance = np.zeros(terms.n_features)
+  # the relevance of every feature is the first evaluation
+  evaluations = terms.n_features
+  started = time.time()
+  # seconds spent scoring the candidates, mostly counting
+  counting = 0.0
+
+  if state is not None:
+    state.check(algorithm, beta, gamma, terms.shape, fast, tolerance is not None)
+    if n_select <= len(state.features):
+      features = [float(f) for f in state.features[:n_select]]
+      return Selection(features, state if n_select == len(state.features) else None,
+                       state.scores[:n_select])
+    start = len(state.features)
+    output[:start] = state.features
+    selected[state.features] = True
+    total, score = state.total.copy(), state.score.copy()
+    scores = list(state.scores)
+    exhausted = state.exhausted
+    evaluations = state.evaluations
+    if fast:
+      seen, skipped = state.seen.copy(), state.skipped
+    if variance is not None:
+      variance = state.variance.copy()
+
+  for i in range(start, n_select):
+    if exhausted:
+      break
+    if stop is not None:
+      if stop.out_of_time(started):
+        output = output[:i]
+        break
+      # kept so that a search stopped below can be resumed from step i.
+      # Fast CMIM updates score in place, together with seen.
+      before = total.copy(), score, None if variance is None else variance.copy()
+    if i > 0:
+      counted = time.time()
+      s = int(output[i - 1])
+
+      if algorithm == "CondMI":
+        # condition on the joint state of everything selected so far
+        score = terms.conditional_relevance(output[:i], n_jobs)
+      elif algorithm == "CMIM" and fast:
+        evaluated = _update_cmim(terms, output[:i], score, seen, selected, n_jobs)
+        skipped += terms.n_features - evaluated
+        evaluations += evaluated
+      elif algorithm == "CMIM":
+        score = np.minimum(score, terms.conditional_relevance([s], n_jobs))
+      elif tolerance is not None:
+        evaluations += _halving_step(terms, samples, algorithm, beta, gamma, output[:i],
+                                     total, variance, selected, n_jobs)
+        score = _score(algorithm, relevance, total, i)
+      elif algorithm != "MIM":
+        total += _increment(terms, algorithm, beta, gamma, s, n_jobs)
+        score = _score(algorithm, relevance, total, i)
+      counting += time.time() - counted
+
+    if i > 0 and algorithm != "MIM" and not fast and tolerance is None:
+      evaluations += terms.n_features
+    # features whose total was partly estimated are behind the leader
+    excluded = selected if variance is None else selected | (variance > 0)
+    candidates = np.where(excluded, -np.inf, score)
+    best = int(np.argmax(candidates))
+    if algorithm == "CondMI" and i > 0 and candidates[best] <= _EPSILON:
+      # nothing left carries information about the labels, the rest
+      # of the output is padded with -1 like libFSToolbox does
+      exhausted = True
+      break
+    gain = float(candidates[best])
+    if algorithm in ("JMI", "DISR") and i > 0:
+      # these criteria are sums over the selected features
+      gain /= i
+    if stop is not None and stop.enough(gain, scores):
+      total, score, variance = before
+      output = output[:i]
+      break
+    output[i] = best
+    selected[best] = True
+    scores.append(gain)
+    if callback is not None:
+      event = {"step": i, "feature": best, "score": gain,
+               "elapsed": time.time() - started, "evaluations": evaluations}
+      if callback(event) is False:
+        output = output[:i + 1]
+        break
+
+  found = [int(f) for f in output if f >= 0]
+  state = _SearchState(algorithm, beta, gamma, terms.shape, found, total, score, exhausted,
+                       scores, seen, skipped, evaluations, variance)
+  selection = Selection(output.tolist(), state, scores, skipped if fast else None)
+  selection.evaluations = evaluations
+  selection.timings = {"count": counting, "select": time.time() - started - counting}
+  return selection
+
+
+def _pairwise_only(terms):
+  """
+    The L{ChunkedDataset} or L{ShardedDataset} behind terms, which
+    only count features in pairs, or None.
+  """
+  while not isinstance(terms, (ChunkedDataset, ShardedDataset)):
+    terms = getattr(terms, "dataset", getattr(terms, "terms", None))
+    if terms is None:
+      return None
+  return terms
+
+
+def _update_cmim(terms, found, score, seen, selected, n_jobs=1):
+  """
+    One step of fast CMIM (F. Fleuret, "Fast binary feature selection
+    with conditional mutual information", JMLR 5, 2004).  score[j] is
+    the minimum of I(X_j;Y) and of I(X_j;Y|X_s) over the first seen[j]
+    features found only, which bounds the CMIM score from above.  The
+    candidates are brought up to date a batch at a time, highest bound
+    first, and only for as long as they could still be the best, so
+    that the best candidate ends up the same as for CMIM.  score and
+    seen are updated in place.
+
+    @param found: the features selected so far.
+    @return: number of conditional mutual informations computed.
+  """
+  n_found = len(found)
+  index = np.arange(len(score))
+  best, best_index = -np.inf, len(score)
+  evaluated, batch = 0, 16
+  while True:
+    # candidates that are out of date and could still beat the best
+    # one that is up to date, ties going to the lowest index
+    open_ = (~selected & (seen < n_found) &
+             ((score > best) | ((score == best) & (index < best_index))))
+    pending = np.flatnonzero(open_)
+    if len(pending) == 0:
+      return evaluated
+    work = pending[np.lexsort((pending, -score[pending]))[:batch]]
+    batch *= 2
+    for m in range(int(seen[work].min()), n_found):
+      todo = work[(seen[work] == m) &
+                  ((score[work] > best) | ((score[work] == best) & (work < best_index)))]
+      if len(todo):
+        relevance = terms.conditional_relevance([found[m]], n_jobs, todo)
+        score[todo] = np.minimum(score[todo], relevance)
+        seen[todo] = m + 1
+        evaluated += len(todo)
+    done = work[seen[work] == n_found]
+    if len(done):
+      top = done[np.lexsort((done, -score[done]))[0]]
+      if score[top] > best or (score[top] == best and top < best_index):
+        best, best_index = score[top], top
+
+
+def _increment(terms, algorithm, beta, gamma, s, n_jobs=1, columns=None):
+  """
+    What selecting feature s adds to the running total of the
+    criterion of every feature, or of the features in columns.
+  """
+  h, h_y, h_label = terms.entropy, terms.label_joint_entropy, terms.label_entropy
+  h_s, h_sy = h[s], h_y[s]
+  if columns is not None:
+    h, h_y = h[columns], h_y[columns]
+  if algorithm == "mRMR":
+    # I(X_j;X_s) alone, which does not involve the labels
+    return h + h_s - terms.pair_entropy(s, n_jobs, columns)
+
+  # H(X_j,X_s,Y) and H(X_j,X_s) for every j
+  h_jsy, h_js = terms.pair_entropies(s, n_jobs, columns)
+  mi = h + h_s - h_js                       # I(X_j;X_s)
+  cmi = h_y + h_sy - h_jsy - h_label        # I(X_j;X_s|Y)
+  jmi = h_js + h_label - h_jsy              # I(X_j,X_s;Y)
+  if algorithm == "BetaGamma":
+    return gamma*cmi - beta*mi
+  if algorithm == "ICAP":
+    return np.maximum(mi - cmi, 0.0)
+  if algorithm == "JMI":
+    return jmi
+  return np.where(h_jsy > 0, jmi / np.where(h_jsy > 0, h_jsy, 1.0), 0.0)
+
+
+def _score(algorithm, relevance, total, i):
+  """
+    The criterion of features with the given relevance and running
+    totals, after i features have been selected.
+  """
+  if algorithm == "mRMR":
+    return relevance - total / i
+  if algorithm == "BetaGamma":
+    return relevance + total
+  if algorithm == "ICAP":
+    return relevance - total
+  return total
+
+
+def _halving_step(terms, samples, algorithm, beta, gamma, found, total, variance, selected,
+                  n_jobs=1):
+  """
+    One step of the approximate search.  What the last feature
+    selected adds to the total of every candidate is estimated on a
+    random subset of the observations, and the candidates whose score
+    is clearly behind that of the leader are dropped.  The subset
+    doubles in size for the candidates left until they are few or the
+    subsets run out, and only the last contenders are counted on
+    every observation.
+
+    The subset is also split into groups.  Plug-in estimates are
+    biased by about c/m on m observations, which the groups are
+    biased by several times as much, so the difference corrects for
+    it.  The spread of the groups gives the variance of the
+    difference of each candidate with the leader, in which the noise
+    that all estimates on the same observations share cancels out.
+    A dropped candidate keeps the estimate in its total, and the
+    variance adds up, until it is a contender again and its total is
+    counted afresh.
+
+    @param samples: the L{_Samples} of terms.
+    @param found: the features selected so far.
+    @return: number of mutual information terms computed.
+    @rtype: integer
+  """
+  s, i = int(found[-1]), len(found)
+  relevance = terms.relevance
+  # how much the score moves with the total
+  scale = 1.0 / i if algorithm == "mRMR" else 1.0
+  alive = np.flatnonzero(~selected)
+  evaluations = 0
+  for r in range(len(samples.sizes)):
+    if len(alive) <= 1:
+      break
+    whole = _increment(samples.subset(r), algorithm, beta, gamma, s, n_jobs, alive)
+    groups = np.array([_increment(group, algorithm, beta, gamma, s, n_jobs, alive)
+                       for group in samples.groups(r)])
+    evaluations += (1 + len(groups)) * len(alive)
+
+    estimate = whole - (groups.mean(axis=0) - whole) / (len(groups) - 1)
+    score = _score(algorithm, relevance[alive], total[alive] + estimate, i)
+    leader = int(np.argmax(score))
+    spread = (groups - groups[:, [leader]]).var(axis=0, ddof=1) / len(groups)
+    spread += variance[alive] + variance[alive[leader]]
+    keep = score + samples.z * scale * np.sqrt(spread) >= score[leader]
+
+    dropped = alive[~keep]
+    total[dropped] += estimate[~keep]
+    variance[dropped] = spread[~keep]
+    alive = alive[keep]
+
+  # the contenders that were dropped before have their totals counted
+  # again, in the order they were first summed
+  stale = alive[variance[alive] > 0]
+  if len(stale):
+    total[stale] = 0
+    for f in found[:-1]:
+      total[stale] += _increment(terms, algorithm, beta, gamma, int(f), n_jobs, stale)
+    variance[stale] = 0
+    evaluations += len(stale) * (i - 1)
+  total[alive] += _increment(terms, algorithm, beta, gamma, s, n_jobs, alive)
+  return evaluations + len(alive)
+
+
+class _Samples(object):
+  """
+    Random subsets of the observations of a data set for the
+    approximate search, each a data set of its own, made the first
+    time it is needed.  Subset r holds the first sizes[r] observations
+    of a random order, and is split into _GROUPS groups.  The largest
+    subset holds a sixteenth of the observations.
+
+    @ivar z: how many standard deviations an estimate may be off by,
+      for the given tolerance.
+  """
+
+  def __init__(self, terms, algorithm, tolerance, seed=0):
+    if algorithm not in ("BetaGamma", "DISR", "JMI", "mRMR"):
+      raise Exception("tolerance is not available for " + algorithm + ".")
+    if not 0 < tolerance < 1:
+      raise Exception("tolerance must be between 0 and 1.")
+    dataset = terms.dataset if isinstance(terms, (MICache, _Target)) else terms
+    if not isinstance(dataset, DiscretizedDataset) or dataset.weights is not None:
+      raise Exception("tolerance needs unweighted data in memory.")
+    self.dataset = dataset
+    # a Gaussian tail bound shared out between the candidates, widened
+    # for a variance estimated from few groups (the Cornish-Fisher
+    # expansion of Student's t)
+    z = np.sqrt(2 * np.log(dataset.n_features / tolerance))
+    self.z = z * (1 + (z*z + 1) / (4.0 * (_GROUPS - 1)))
+    self.order = np.random.RandomState(seed).permutation(dataset.n_observations)
+    self.sizes = []
+    size = _FIRST_SAMPLE
+    while size <= dataset.n_observations // 16:
+      self.sizes.append(size)
+      size *= 2
+    self._subsets = {}
+    self._groups = {}
+
+  def subset(self, r):
+    if r not in self._subsets:
+      self._subsets[r] = self._make(self.order[:self.sizes[r]])
+    return self._subsets[r]
+
+  def groups(self, r):
+    if r not in self._groups:
+      rows = self.order[:self.sizes[r]]
+      self._groups[r] = [self._make(group) for group in np.array_split(rows, _GROUPS)]
+    return self._groups[r]
+
+  def _make(self, rows):
+    rows = np.sort(rows)
+    data = self.dataset.data[rows]
+    if not _is_sparse(data):
+      data = np.asfortranarray(data)
+    return type(self.dataset)(data, self.dataset.labels[rows])
+
+
+class Selection(list):
+  """
+    Features in the order they were selected, as returned by the NumPy
+    backend.  This is the same list of floats that libFSToolbox gives,
+    which also remembers where the greedy search stopped.  Pass it
+    back to the same selector with resume_from= to select more
+    features without redoing the steps already taken:
+
+      >>> first = JMI(dataset, None, 50)
+      >>> more = JMI(dataset, None, 100, resume_from=first)
+
+    @ivar state: what the search needs to carry on, or None when the
+      selection was cut short from a longer one.
+    @ivar scores: the value of the criterion for each feature when it
+      was selected.  JMI and DISR sum over the features selected
+      before, their scores are divided by the number of terms.
+    @ivar skipped: for CMIM with fast=True, the number of conditional
+      mutual informations that the exact search computes and the
+      lazy one did not.  None otherwise.
+    @ivar timings: where the time went, in seconds: "convert" for
+      checking and encoding the input, "count" for scoring the
+      candidates and "select" for the rest of the search.  The stages
+      of L{select} instead, and "store" alone for a selection read
+      back from a L{ResultStore}.
+    @ivar evaluations: number of mutual information terms computed,
+      one for each feature scored at each step, counting the
+      relevance of every feature as the first step.  None for a
+      prefix of a longer selection.
+  """
+
+  def __init__(self, features, state=None, scores=(), skipped=None):
+    list.__init__(self, features)
+    self.state = state
+    self.scores = list(scores)
+    self.skipped = skipped
+    self.timings = None
+    self.evaluations = None
+
+
+class EarlyStop(object):
+  """
+    A rule ending a greedy search before n_select features have been
+    selected.  The search stops as soon as any of the limits given is
+    reached, and returns only the features selected up to then:
+
+      >>> features = JMI(data, labels, 200, stop=EarlyStop(min_gain=0.01))
+
+    The scores compared are those kept in L{Selection.scores}.  The
+    first feature is the most relevant one whatever the selector, and
+    its score is I(X;Y), which is on another scale than the criterion
+    of JMI (a mean joint mutual information) and of DISR (a mean
+    symmetrical relevance, below 1).  min_ratio is therefore relative
+    to the score of the second feature, the first one the criterion
+    chose.  Neither limit means much for BetaGamma, CIFE, Condred and
+    MIFS, whose scores are running sums that may grow or turn negative.
+
+    @ivar min_gain: stop once the score of the next feature falls
+      below this.
+    @ivar min_ratio: stop once the score of the next feature falls
+      below this fraction of the score of the second feature.
+    @ivar max_seconds: stop once the search has run this long.  A step
+      that has started is always finished.
+  """
+
+  def __init__(self, min_gain=None, min_ratio=None, max_seconds=None):
+    self.min_gain = min_gain
+    self.min_ratio = min_ratio
+    self.max_seconds = max_seconds
+
+  def enough(self, gain, scores):
+    """
+      Whether the search should stop rather than select a feature
+      scoring gain after the features that scored scores.
+    """
+    if self.min_gain is not None and gain < self.min_gain:
+      return True
+    if self.min_ratio is not None and len(scores) > 1 and gain < self.min_ratio * scores[1]:
+      return True
+    return False
+
+  def out_of_time(self, started):
+    """
+      Whether a search that started at time.time() == started has
+      used up max_seconds.
+    """
+    return self.max_seconds is not None and time.time() - started >= self.max_seconds
+
+
+class _SearchState(object):
+  """
+    The features a greedy search has selected, and the running totals
+    of its criterion for every feature.  The last feature selected has
+    not been scored against yet.
+  """
+
+  def __init__(self, algorithm, beta, gamma, shape, features, total, score, exhausted,
+               scores, seen=None, skipped=0, evaluations=0, variance=None):
+    self.algorithm = algorithm
+    self.beta = beta
+    self.gamma = gamma
+    self.shape = shape
+    self.features = features
+    self.total = total
+    self.score = score
+    self.exhausted = exhausted
+    self.scores = scores
+    self.seen = seen
+    self.skipped = skipped
+    self.evaluations = evaluations
+    self.variance = variance
+
+  def check(self, algorithm, beta, gamma, shape, fast=False, approximate=False):
+    """
+      Raise an exception unless the search can carry on as algorithm
+      on data of the given shape.
+    """
+    if fast != (self.seen is not None):
+      raise Exception("resume_from was selected with fast=" + str(not fast) + ".")
+    if approximate != (self.variance is not None):
+      raise Exception("resume_from was selected " + ("exactly." if approximate else
+                                                     "with a tolerance."))
+    if algorithm != self.algorithm:
+      raise Exception("resume_from was selected by " + self.algorithm + ", not " +
+                      algorithm + ".")
+    if (beta, gamma) != (self.beta, self.gamma):
+      raise Exception("resume_from was selected with other values of beta and gamma.")
+    if tuple(shape) != tuple(self.shape):
+      raise Exception("resume_from was selected from data of a different shape.")
+
+
+class MICache(object):
+  """
+    Mutual information terms of one data set, shared between the
+    selectors and between calls.  The relevance I(X_j;Y) of every
+    feature is computed up front.  The joint entropies of every
+    feature with a selected feature X_s (from which I(X_j;X_s),
+    I(X_j;X_s|Y), I(X_j,X_s;Y) and I(X_j;Y|X_s) all follow) are
+    computed the first time a selector asks for them and kept until
+    max_bytes is exceeded, the least recently used being dropped
+    first.  Pass the cache to any selector with cache=.
+
+      >>> cache = MICache(data, labels)
+      >>> JMI(data, labels, 10, cache=cache)
+      >>> mRMR(data, labels, 10, cache=cache)
+
+    @ivar hits: number of requests answered from the cache.
+    @ivar misses: number of requests that had to be computed.
+  """
+
+  def __init__(self, data, labels, max_bytes=1 << 30):
+    """
+      @param data: data in a Numpy array such that len(data) = 
+        n_observations, and len(data.transpose()) = n_features
+      @type data: ndarray or DiscretizedDataset
+      @param labels: labels represented in a numpy list with 
+        n_observations as the number of elements.
+      @type labels: ndarray
+      @param max_bytes: memory budget for the cached terms.
+      @type max_bytes: integer
+    """
+    self.dataset = _dataset(data, labels)
+    self.max_bytes = max_bytes
+    self.n_bytes = 0
+    self.hits = 0
+    self.misses = 0
+    self._terms = OrderedDict()
+    self._lock = threading.Lock()
+
+    for name in ("n_observations", "n_features", "shape", "relevance", "entropy",
+                 "label_entropy", "label_joint_entropy"):
+      setattr(self, name, getattr(self.dataset, name))
+
+  def pair_entropies(self, s, n_jobs=1, columns=None):
+    """
+      H(X_j,X_s,Y) and H(X_j,X_s) for every feature X_j, see
+      L{DiscretizedDataset.pair_entropies}.  The terms of every feature
+      are computed and cached, whatever columns holds.
+    """
+    h_jsy, h_js = self._get(int(s), self.dataset.pair_entropies, int(s), n_jobs)
+    if columns is None:
+      return h_jsy, h_js
+    return h_jsy[columns], h_js[columns]
+
+  def pair_entropy(self, s, n_jobs=1, columns=None):
+    """
+      H(X_j,X_s) for every feature X_j, from the cached pair_entropies
+      so that the selectors share them.
+    """
+    return self.pair_entropies(s, n_jobs, columns)[1]
+
+  def conditional_relevance(self, features, n_jobs=1, columns=None):
+    """
+      I(X_j;Y|X_S) for every feature X_j, see
+      L{DiscretizedDataset.conditional_relevance}.  The terms of every
+      feature are computed and cached, whatever columns holds.
+    """
+    features = [int(f) for f in features]
+    if len(features) == 1:
+      # follows from the pairwise entropies of X_s
+      s = features[0]
+      h_jsy, h_js = self.pair_entropies(s, n_jobs)
+      relevance = h_js + self.label_joint_entropy[s] - h_jsy - self.entropy[s]
+    else:
+      relevance = self._get(frozenset(features), self.dataset.conditional_relevance,
+                            features, n_jobs)
+    return relevance if columns is None else relevance[columns]
+
+  def clear(self):
+    """
+      Drop every cached term.
+    """
+    self._terms.clear()
+    self.n_bytes = 0
+
+  def _get(self, key, compute, *args):
+    """
+      Look a term up, computing and storing it on a miss.  The most
+      recently used terms are kept at the end of the dict.  Terms are
+      computed outside of the lock, so threads sharing the cache do
+      not wait on each other.
+    """
+    with self._lock:
+      value = self._terms.pop(key, None)
+      if value is not None:
+        self.hits += 1
+        self._terms[key] = value
+        return value
+      self.misses += 1
+    value = compute(*args)
+    with self._lock:
+      if key not in self._terms:
+        self.n_bytes += _nbytes(value)
+      else:
+        self.n_bytes -= _nbytes(self._terms.pop(key)) - _nbytes(value)
+      self._terms[key] = value
+      while self._terms and self.n_bytes > self.max_bytes:
+        self.n_bytes -= _nbytes(self._terms.popitem(last=False)[1])
+    return value
+
+
+class ResultStore(object):
+  """
+    Selections kept on disk, so that a selection asked for again, by
+    this process or another one, is read back rather than run.  A
+    selection is found by a hash of the contents of the data and the
+    labels together with the selector and its beta and gamma.  A
+    selection of more features serves any smaller n_select, since a
+    greedy search selects the same first features whatever n_select,
+    and a CondMI search that ran out of features serves any n_select.
+    Once the files take more than max_bytes the least recently used
+    are removed.  Pass the store to any selector with store=.
+
+      >>> store = ResultStore("~/.cache/feast")
+      >>> JMI(data, labels, 10, store=store)
+      >>> JMI(data, labels, 5, store=store)    # read back
+
+    Hashing reads the data once, which is much less than any selection
+    does.  The same values with another dtype or memory layout hash
+    differently.  Searches cut short by stop= or followed through
+    callback=, and searches for several targets, always run and are
+    not kept.
+
+    @ivar hits: number of selections read back.
+    @ivar misses: number of selections that had to be run.
+  """
+
+  def __init__(self, path, max_bytes=1 << 30):
+    """
+      @param path: directory holding the selections, created when
+        missing.
+      @type path: string
+      @param max_bytes: disk budget for the selections kept.
+      @type max_bytes: integer
+    """
+    self.path = os.path.expanduser(path)
+    self.max_bytes = max_bytes
+    self.hits = 0
+    self.misses = 0
+    if not os.path.isdir(self.path):
+      try:
+        os.makedirs(self.path)
+      except OSError:
+        # made by another process in the meantime
+        if not os.path.isdir(self.path):
+          raise
+
+  def select(self, selector, data, labels, n_select, beta=None, gamma=None, **params):
+    """
+      Read the selection back, or run selector and keep the result.
+
+      @param selector: one of the selectors of this module, e.g. JMI.
+      @param params: further keyword arguments for the selector.
+      @rtype: Selection
+    """
+    if beta is not None:
+      params.update(beta=beta, gamma=gamma)
+    if (params.get("stop") is not None or params.get("callback") is not None
+        or np.ndim(labels) == 2):
+      return selector(data, labels, n_select, **params)
+
+    started = time.time()
+    options = dict((name, params[name]) for name in _NUMPY_OPTIONS if name in params)
+    backend = "numpy" if _use_numpy(params.get("backend"), data, labels, **options) else "c"
+    key = self.key(selector.__name__, data, labels, backend, beta, gamma,
+                   params.get("tolerance"))
+    file = os.path.join(self.path, key + ".npz")
+
+    found = self._read(file)
+    if found is not None:
+      features, scores, exhausted = found
+      # a search that ran out of informative features, which CondMI
+      # pads with -1, selects the same ones for any larger n_select
+      if n_select <= len(features) or exhausted:
+        self.hits += 1
+        features = features[:n_select].tolist()
+        features += [-1.0] * (n_select - len(features))
+        selection = Selection(features, scores=scores[:n_select].tolist())
+        selection.timings = {"store": time.time() - started}
+        selection.evaluations = 0
+        return selection
+    self.misses += 1
+
+    selection = selector(data, labels, n_select, **params)
+    self._write(file, selection)
+    return selection
+
+  def key(self, algorithm, data, labels, backend="numpy", beta=None, gamma=None,
+          tolerance=None):
+    """
+      The name a selection is kept under, a hash of data and labels
+      and of the other arguments.
+    """
+    hasher = hashlib.sha1()
+    arguments = (__version__, algorithm, backend, beta, gamma)
+    if tolerance is not None:
+      arguments += (tolerance,)
+    hasher.update(repr(arguments).encode("ascii"))
+    if isinstance(data, DiscretizedDataset):
+      arrays = [getattr(data, name) for name in data._saved] + [data.weights]
+      hasher.update(type(data).__name__.encode("ascii"))
+    elif _is_sparse(data):
+      arrays = [data.data, data.indices, data.indptr, data.shape, labels]
+      hasher.update(data.format.encode("ascii"))
+    elif _is_data_set(data):
+      raise Exception("store needs the data as an array or a DiscretizedDataset.")
+    else:
+      arrays = [data, labels]
+    for array in arrays:
+      _update_hash(hasher, array)
+    return hasher.hexdigest()
+
+  def clear(self):
+    """
+      Remove every selection kept.
+    """
+    for name in os.listdir(self.path):
+      if name.endswith(".npz"):
+        self._remove(os.path.join(self.path, name))
+
+  def _read(self, file):
+    """
+      (features, scores, whether the search ran out of features) kept
+      in file, or None.
+    """
+    try:
+      archive = np.load(file)
+      try:
+        found = archive["features"], archive["scores"], bool(archive["exhausted"])
+      finally:
+        archive.close()
+      # least recently used goes by the modification time of the file
+      os.utime(file, None)
+    except (IOError, OSError, KeyError, ValueError):
+      return None
+    return found
+
+  def _write(self, file, selection):
+    """
+      Keep selection in file, then remove the least recently used
+      files until the store fits in max_bytes.  The file is written
+      under another name and renamed, so other processes never read
+      half of it.
+    """
+    handle, temporary = tempfile.mkstemp(suffix=".tmp", dir=self.path)
+    try:
+      features = np.asarray(selection, dtype=np.float64)
+      with os.fdopen(handle, "wb") as f:
+        np.savez(f, features=features,
+                 scores=np.asarray(getattr(selection, "scores", ()), dtype=np.float64),
+                 exhausted=bool((features < 0).any()))
+      os.rename(temporary, file)
+    except BaseException:
+      self._remove(temporary)
+      raise
+
+    files = []
+    for name in os.listdir(self.path):
+      if name.endswith(".npz"):
+        try:
+          status = os.stat(os.path.join(self.path, name))
+        except OSError:
+          continue
+        files.append((status.st_mtime, status.st_size, name))
+    files.sort()
+    n_bytes = sum(size for _, size, _ in files)
+    for _, size, name in files:
+      if n_bytes <= self.max_bytes:
+        break
+      self._remove(os.path.join(self.path, name))
+      n_bytes -= size
+
+  def _remove(self, file):
+    """
+      Remove file unless another process already did.
+    """
+    try:
+      os.remove(file)
+    except OSError:
+      pass
+
+
+def _update_hash(hasher, array):
+  """
+    Feed the dtype, shape and contents of array to hasher, a block at
+    a time.  Arrays laid out in either order are read in place.
+  """
+  if array is None:
+    hasher.update(b"None;")
+    return
+  array = np.asarray(array)
+  order = "C"
+  if array.flags.f_contiguous and not array.flags.c_contiguous:
+    array, order = array.T, "F"
+  array = np.ascontiguousarray(array)
+  hasher.update(("%s%s%s;" % (array.dtype.str, array.shape, order)).encode("ascii"))
+  flat = array.reshape(-1).view(np.uint8)
+  for start in range(0, len(flat), _BLOCK_SIZE):
+    hasher.update(flat[start:start + _BLOCK_SIZE])
+
+
+def BetaGammaSweep(data, labels, n_select, betas, gammas, cache=None, n_jobs=1):
+  """
+    Run BetaGamma for every combination of beta and gamma in one go.
+    The relevance, redundancy and conditional redundancy terms are
+    computed once and all of the greedy searches advance together,
+    so the cost grows with the number of distinct features selected
+    across the grid rather than with the number of grid points.
+
+    @param data: data in a Numpy array such that len(data) = 
+      n_observations, and len(data.transpose()) = n_features
+    @type data: ndarray or DiscretizedDataset
+    @param labels: labels represented in a numpy list with 
+      n_observations as the number of elements. That is 
+      len(labels) = len(data) = n_observations.
+    @type labels: ndarray
+    @param n_select: number of features to select.
+    @type n_select: integer
+    @param betas: penalties attached to I(X_j;X_k)
+    @type betas: list of floats
+    @param gammas: weights attached to I(X_k;X_j|Y)
+    @type gammas: list of floats
+    @param cache: an L{MICache} built from data and labels.
+    @type cache: MICache
+    @param n_jobs: number of threads computing the terms, -1 for one
+      per CPU.
+    @type n_jobs: integer
+    @return: the features selected for each (beta, gamma), in the
+      order they were selected.
+    @rtype: dict
+  """
+  if cache is None:
+    cache = MICache(data, labels)
+  elif getattr(data, "shape", None) != cache.shape:
+    raise Exception("cache was built from data of a different shape.")
+  if n_select > cache.n_features:
+    raise Exception("n_select must not be larger than the number of features.")
+
+  grid = [(beta, gamma) for beta in betas for gamma in gammas]
+  beta = np.array([g[0] for g in grid], dtype=np.float64)[:, None]
+  gamma = np.array([g[1] for g in grid], dtype=np.float64)[:, None]
+  h, h_y, h_label = cache.entropy, cache.label_joint_entropy, cache.label_entropy
+
+  # one row per grid point
+  output = np.zeros((len(grid), n_select), dtype=np.int64)
+  selected = np.zeros((len(grid), cache.n_features), dtype=bool)
+  total = np.zeros((len(grid), cache.n_features))
+  rows = np.arange(len(grid))
+
+  for i in range(n_select):
+    if i > 0:
+      # the terms of each distinct feature selected last are fetched once
+      last, index = np.unique(output[:, i - 1], return_inverse=True)
+      mi = np.empty((len(last), cache.n_features))
+      cmi = np.empty((len(last), cache.n_features))
+      for u, s in enumerate(last):
+        h_jsy, h_js = cache.pair_entropies(s, n_jobs)
+        mi[u] = h + h[s] - h_js
+        cmi[u] = h_y + h_y[s] - h_jsy - h_label
+      index = index.ravel()
+      total += gamma*cmi[index] - beta*mi[index]
+
+    candidates = np.where(selected, -np.inf, cache.relevance + total)
+    best = np.argmax(candidates, axis=1)
+    output[:, i] = best
+    selected[rows, best] = True
+
+  return dict((g, output[k].astype(np.float64).tolist()) for k, g in enumerate(grid))
+
+
+def select(data, labels, n_select, algorithm="JMI", prefilter="MIM", prefilter_k=5000,
+           n_jobs=1, **params):
+  """
+    Select features in two stages: a cheap prefilter keeps the
+    prefilter_k features most relevant to the labels, and the
+    expensive criterion then only looks at those.  The relevance of
+    every feature is computed in one vectorized pass while the data
+    is encoded, the survivors are a view of the encoded data rather
+    than a copy, and the features returned are indices into the
+    original columns.  Runs on the NumPy backend.
+
+      >>> features = select(data, labels, 50, algorithm="JMI", prefilter_k=5000)
+      >>> features.timings
+      {'encode': 41.2, 'prefilter': 0.01, 'select': 12.5}
+
+    @param data: data in a Numpy array such that len(data) = 
+      n_observations, and len(data.transpose()) = n_features
+    @type data: ndarray, scipy.sparse matrix or DiscretizedDataset
+    @param labels: labels represented in a numpy list with 
+      n_observations as the number of elements.
+    @type labels: ndarray
+    @param n_select: number of features to select.
+    @type n_select: integer
+    @param algorithm: name of the selector run on the survivors.
+    @type algorithm: string
+    @param prefilter: "MIM" to keep the features of highest I(X_j;Y),
+      or None to run algorithm on every feature.
+    @type prefilter: string
+    @param prefilter_k: number of features the prefilter keeps.
+    @type prefilter_k: integer
+    @param n_jobs: number of threads, -1 for one per CPU.
+    @type n_jobs: integer
+    @param params: further keyword arguments for the selector, such
+      as beta, gamma, cache or stop.
+    @return: features in the order they were selected, as indices of
+      the columns of data.  Its timings attribute holds the seconds
+      spent encoding the data, in the prefilter and in the selection.
+    @rtype: L{Selection}
+  """
+  if algorithm not in _SELECTORS:
+    raise Exception("unknown algorithm " + str(algorithm))
+  if prefilter not in ("MIM", None):
+    raise Exception("unknown prefilter " + str(prefilter))
+  timings = {}
+
+  started = time.time()
+  terms = params.pop("cache", None)
+  if terms is None:
+    terms = _dataset(data, labels, n_jobs)
+  elif getattr(data, "shape", None) != terms.shape:
+    raise Exception("cache was built from data of a different shape.")
+  timings["encode"] = time.time() - started
+
+  started = time.time()
+  columns = None
+  if prefilter == "MIM" and prefilter_k < terms.n_features:
+    if n_select > prefilter_k:
+      raise Exception("n_select must not be larger than prefilter_k.")
+    # the order MIM would select them in, ties going to the lowest index
+    ranking = np.lexsort((np.arange(terms.n_features), -terms.relevance))
+    columns = np.sort(ranking[:prefilter_k])
+    terms = _Columns(terms, columns)
+    callback = params.get("callback")
+    if callback is not None:
+      def report(event):
+        event["feature"] = int(columns[event["feature"]])
+        return callback(event)
+      params["callback"] = report
+  timings["prefilter"] = time.time() - started
+
+  started = time.time()
+  selection = _SELECTORS[algorithm](terms, None, n_select, n_jobs=n_jobs, **params)
+  timings["select"] = time.time() - started
+
+  features = [float(f) for f in selection]
+  if columns is not None:
+    features = [float(columns[int(f)]) if f >= 0 else f for f in features]
+  result = Selection(features, None, getattr(selection, "scores", ()),
+                     getattr(selection, "skipped", None))
+  result.evaluations = getattr(selection, "evaluations", None)
+  result.timings = timings
+  return result
+
+
+class _Columns(object):
+  """
+    Some of the features of a data set, seen as a data set of their
+    own without copying any data.  Feature i of the view is feature
+    columns[i] of terms.
+  """
+
+  def __init__(self, terms, columns):
+    self.terms = terms
+    self.columns = np.asarray(columns, dtype=np.int64)
+    self.n_observations = terms.n_observations
+    self.n_features = len(self.columns)
+    self.shape = (self.n_observations, self.n_features)
+    self.relevance = terms.relevance[self.columns]
+    self.entropy = terms.entropy[self.columns]
+    self.label_joint_entropy = terms.label_joint_entropy[self.columns]
+    self.label_entropy = terms.label_entropy
+
+  def pair_entropies(self, s, n_jobs=1, columns=None):
+    return self.terms.pair_entropies(self.columns[int(s)], n_jobs, self._columns(columns))
+
+  def pair_entropy(self, s, n_jobs=1, columns=None):
+    return self.terms.pair_entropy(self.columns[int(s)], n_jobs, self._columns(columns))
+
+  def conditional_relevance(self, features, n_jobs=1, columns=None):
+    features = [self.columns[int(f)] for f in features]
+    return self.terms.conditional_relevance(features, n_jobs, self._columns(columns))
+
+  def _columns(self, columns):
+    """
+      The features of terms behind the features columns of the view.
+    """
+    return self.columns if columns is None else self.columns[columns]
+
+
+def stability_select(algorithm, data, labels, n_select, n_resamples=100, n_jobs=1,
+                     seed=None, **params):
+  """
+    Run a selector on bootstrap resamples of the data, to see how
+    stable its selection is.  The data is encoded once, and every
+    resample is a vector of row weights over the same states, so no
+    rows are copied.  The resamples run on a pool of n_jobs threads.
+
+      >>> result = stability_select("JMI", data, labels, 10, n_resamples=200, n_jobs=-1)
+      >>> result["frequency"]
+
+    @param algorithm: name of a selector, e.g. "JMI", or the selector
+      itself.
+    @param data: data in a Numpy array such that len(data) = 
+      n_observations, and len(data.transpose()) = n_features
+    @type data: ndarray or DiscretizedDataset
+    @param labels: labels represented in a numpy list with 
+      n_observations as the number of elements.
+    @type labels: ndarray
+    @param n_select: number of features to select on each resample.
+    @type n_select: integer
+    @param n_resamples: number of bootstrap resamples.
+    @type n_resamples: integer
+    @param n_jobs: number of threads, -1 for one per CPU.
+    @type n_jobs: integer
+    @param seed: seed or np.random.RandomState drawing the resamples.
+    @param params: further keyword arguments for the selector, such
+      as beta, gamma or stop.
+    @return: a dict holding "selections", the features selected on
+      each resample; "frequency", the fraction of resamples selecting
+      each feature; "mean_rank" and "rank_std", the mean and standard
+      deviation of the position (from 0) of each feature among the
+      resamples that selected it, nan for features never selected.
+    @rtype: dict
+  """
+  algorithm = _selector(algorithm)
+  dataset = _dataset(data, labels, n_jobs)
+  if not isinstance(dataset, DiscretizedDataset):
+    # resamples reweight the rows of a data set in memory
+    raise Exception("stability_select needs the data in memory.")
+  n = dataset.n_observations
+
+  if isinstance(seed, np.random.RandomState):
+    random = seed
+  else:
+    random = np.random.RandomState(seed)
+  # the weights are drawn up front so that they do not depend on n_jobs
+  draws = [random.randint(0, n, n) for r in range(n_resamples)]
+
+  def run(rows):
+    resample = dataset.resample(np.bincount(rows, minlength=n))
+    return algorithm(resample, None, n_select, **params)
+  selections = _map(run, draws, n_jobs)
+
+  count = np.zeros(dataset.n_features)
+  rank_sum = np.zeros(dataset.n_features)
+  rank_squares = np.zeros(dataset.n_features)
+  for features in selections:
+    features = np.array([int(f) for f in features if f >= 0], dtype=np.int64)
+    ranks = np.arange(len(features))
+    count[features] += 1
+    rank_sum[features] += ranks
+    rank_squares[features] += ranks**2
+
+  with np.errstate(invalid="ignore", divide="ignore"):
+    mean_rank = rank_sum / count
+    rank_std = np.sqrt(np.maximum(rank_squares / count - mean_rank**2, 0.0))
+  return {"selections": selections, "frequency": count / max(n_resamples, 1),
+          "mean_rank": mean_rank, "rank_std": rank_std}
+
+
+def cv_select(algorithm, data, labels, n_select, folds=10, n_jobs=1, **params):
+  """
+    Run a selector on the training observations of every fold of a
+    cross-validation.  The count tables of the whole data set are
+    built once, and the tables of each training set are those less the
+    counts of its held out observations, so each fold only counts its
+    held out observations rather than all of the others.  The tables
+    of a feature selected in several folds are shared between them.
+    The folds run on a pool of n_jobs threads.
+
+      >>> selections = cv_select("JMI", data, labels, 10, folds=10, n_jobs=-1)
+
+    @param algorithm: name of a selector, e.g. "JMI", or the selector
+      itself.
+    @param data: data in a Numpy array such that len(data) = 
+      n_observations, and len(data.transpose()) = n_features
+    @type data: ndarray, scipy.sparse matrix or DiscretizedDataset
+    @param labels: labels represented in a numpy list with 
+      n_observations as the number of elements.
+    @type labels: ndarray
+    @param n_select: number of features to select on each fold.
+    @type n_select: integer
+    @param folds: the number of folds, each holding out a contiguous
+      block of observations, or a list of the observations held out by
+      each fold.  (train, test) pairs, as made by the split method of
+      scikit-learn's cross-validators, are accepted too.
+    @param n_jobs: number of threads, -1 for one per CPU.
+    @type n_jobs: integer
+    @param params: further keyword arguments for the selector.
+    @return: the features selected on each fold, in the order of folds.
+    @rtype: list
+  """
+  algorithm = _selector(algorithm)
+  dataset = _dataset(data, labels, n_jobs)
+  if not isinstance(dataset, DiscretizedDataset):
+    raise Exception("cv_select needs the data in memory.")
+  if isinstance(folds, int):
+    held_out = np.array_split(np.arange(dataset.n_observations), folds)
+  else:
+    held_out = [np.asarray(fold[1] if isinstance(fold, tuple) else fold, dtype=np.int64)
+                for fold in folds]
+
+  whole = _WholeCounts(dataset)
+  def run(rows):
+    return algorithm(_Fold(whole, rows), None, n_select, **params)
+  return _map(run, held_out, n_jobs)
+
+
+class _WholeCounts(object):
+  """
+    Count tables of a whole data set, computed the first time a fold
+    asks for them and shared between the folds.
+  """
+
+  def __init__(self, dataset):
+    self.dataset = dataset
+    self._tables = {}
+    self._lock = threading.Lock()
+
+  def get(self, key, z, k, n_jobs=1):
+    """
+      The joint counts of every feature with z, see
+      L{DiscretizedDataset.joint_counts}, kept under key.
+    """
+    with self._lock:
+      table = self._tables.get(key)
+    if table is None:
+      table = self.dataset.joint_counts(z, k, None, n_jobs)
+      with self._lock:
+        table = self._tables.setdefault(key, table)
+    return table
+
+
+class _Fold(object):
+  """
+    The observations of a data set other than the held out ones.
+    Every count table is that of the whole data set less that of the
+    held out observations.
+  """
+
+  def __init__(self, whole, held_out, n_jobs=1):
+    dataset = whole.dataset
+    self.whole, self.dataset = whole, dataset
+    self.held_out = np.asarray(held_out, dtype=np.int64)
+    self.n_features = dataset.n_features
+    self.n_observations = dataset.n_observations - len(self.held_out)
+    self.shape = (self.n_observations, self.n_features)
+    self._training = None
+
+    n_label_states = dataset.n_label_states
+    weights = None if dataset.weights is None else dataset.weights[self.held_out]
+    label_counts = dataset.label_counts - np.bincount(dataset.labels[self.held_out], weights,
+                                                      minlength=n_label_states)
+    zeros = np.zeros(dataset.n_observations, dtype=np.int64)
+    state_counts = (dataset.state_counts -
+                    dataset.joint_counts(zeros, 1, self.held_out, n_jobs)[1])
+    offsets, label_joint = self._counts("labels", dataset.labels, n_label_states, n_jobs)
+
+    self.n_samples = label_counts.sum()
+    self.entropy = _entropy((dataset.state_offsets, state_counts), self.n_samples)
+    self.label_entropy = _entropy(([0], label_counts), self.n_samples)[0]
+    self.label_joint_entropy = _entropy((offsets, label_joint), self.n_samples)
+    self.relevance = self.entropy + self.label_entropy - self.label_joint_entropy
+
+  def _counts(self, key, z, k, n_jobs=1):
+    """
+      The joint counts of every feature with z on this fold.
+    """
+    offsets, counts = self.whole.get(key, z, k, n_jobs)
+    return offsets, counts - self.dataset.joint_counts(z, k, self.held_out, n_jobs)[1]
+
+  def pair_entropies(self, s, n_jobs=1, columns=None):
+    """
+      H(X_j,X_s,Y) and H(X_j,X_s) for every feature X_j, see
+      L{DiscretizedDataset.pair_entropies}.
+    """
+    s = int(s)
+    n_label_states = self.dataset.n_label_states
+    z = self.dataset.column(s) * n_label_states + self.dataset.labels
+    offsets, counts = self._counts(s, z, int(self.dataset.cardinality[s]) * n_label_states,
+                                   n_jobs)
+    h_jsy = _entropy((offsets, counts), self.n_samples)
+    h_js = _entropy((offsets // n_label_states, counts.reshape(-1, n_label_states).sum(axis=1)),
+                    self.n_samples)
+    if columns is None:
+      return h_jsy, h_js
+    return h_jsy[columns], h_js[columns]
+
+  def pair_entropy(self, s, n_jobs=1, columns=None):
+    """
+      H(X_j,X_s) for every feature X_j, see
+      L{DiscretizedDataset.pair_entropy}.
+    """
+    s = int(s)
+    offsets, counts = self._counts(("pair", s), self.dataset.column(s),
+                                   int(self.dataset.cardinality[s]), n_jobs)
+    h_js = _entropy((offsets, counts), self.n_samples)
+    return h_js if columns is None else h_js[columns]
+
+  def conditional_relevance(self, features, n_jobs=1, columns=None):
+    """
+      I(X_j;Y|X_S) for every feature X_j, see
+      L{DiscretizedDataset.conditional_relevance}.  Conditioning on
+      several features at once counts the training observations
+      directly.
+    """
+    features = [int(f) for f in features]
+    if len(features) == 1:
+      s = features[0]
+      h_jsy, h_js = self.pair_entropies(s, n_jobs, columns)
+      h_sy, h_s = self.label_joint_entropy[s], self.entropy[s]
+      return h_js + h_sy - h_jsy - h_s
+    if self._training is None:
+      weights = np.ones(self.dataset.n_observations)
+      if self.dataset.weights is not None:
+        weights = self.dataset.weights.copy()
+      weights[self.held_out] = 0
+      self._training = self.dataset.resample(weights, n_jobs)
+    return self._training.conditional_relevance(features, n_jobs, columns)
+
+
+def _is_data_set(data):
+  """
+    True for the data sets that the NumPy backend reads directly.
+  """
+  return isinstance(data, (DiscretizedDataset, ChunkedDataset, ShardedDataset, MICache,
+                           _Columns, _Fold, _Target))
+
+
+def _selector(algorithm):
+  """
+    The selector called algorithm, or algorithm itself if it already
+    is one.
+  """
+  if callable(algorithm):
+    return algorithm
+  if algorithm not in _SELECTORS:
+    raise Exception("unknown algorithm " + str(algorithm))
+  return _SELECTORS[algorithm]
+
+
+def _dataset(data, labels, n_jobs=1):
+  """
+    The L{DiscretizedDataset} of data and labels, or data itself if it
+    already is a data set.
+  """
+  if _is_data_set(data):
+    return data
+  if _is_sparse(data):
+    return SparseDataset(data, labels, n_jobs)
+  return DiscretizedDataset(data, labels, n_jobs)
+
+
+def _nbytes(value):
+  """
+    Memory held by an array or a tuple of arrays.
+  """
+  if isinstance(value, tuple):
+    return sum(v.nbytes for v in value)
+  return value.nbytes
+
+
+# the asyncio interface needs Python 3 and lives in a module of its own
+aio = None
+if sys.version_info >= (3, 5):
+  try:
+    import feast_aio as aio
+  except ImportError:
+    pass
+
+
+def _main(argv=None):
+  """
+    python -m feast: select features from a table with a column of
+    labels, and write the index and the score of each feature selected
+    on a line of its own.
+
+      python -m feast JMI otus.tsv 10 --out selected.tsv
+  """
+  import argparse
+  parser = argparse.ArgumentParser(prog="python -m feast",
+                                   description="Select features from a table of observations.")
+  parser.add_argument("algorithm", choices=sorted(_SELECTORS))
+  parser.add_argument("table", help="a text file with a line per observation, or a .npy file")
+  parser.add_argument("n_select", type=int, help="number of features to select")
+  parser.add_argument("--label-column", type=int, default=-1,
+                      help="the column holding the labels, the last one by default")
+  parser.add_argument("--delimiter", help="\",\" for .csv files and whitespace otherwise by default")
+  parser.add_argument("--skip-header", type=int, default=0, help="number of lines to skip")
+  parser.add_argument("--backend", choices=["c", "numpy"])
+  parser.add_argument("--n-jobs", type=int, default=1)
+  parser.add_argument("--beta", type=float, help="for BetaGamma")
+  parser.add_argument("--gamma", type=float, help="for BetaGamma")
+  parser.add_argument("--tolerance", type=float, help="run the approximate search")
+  parser.add_argument("--out", help="file to write to, standard output by default")
+  args = parser.parse_args(argv)
+
+  params = {"backend": args.backend, "n_jobs": args.n_jobs}
+  for name in ("beta", "gamma", "tolerance"):
+    if getattr(args, name) is not None:
+      params[name] = getattr(args, name)
+  if args.algorithm != "BetaGamma" and ("beta" in params or "gamma" in params):
+    parser.error("--beta and --gamma are only taken by BetaGamma")
+  if args.algorithm in ("CMIM", "CondMI", "ICAP", "MIM") and "tolerance" in params:
+    parser.error("--tolerance is not taken by " + args.algorithm)
+  data, labels = load_table(args.table, args.label_column, args.delimiter, args.skip_header)
+  selection = _SELECTORS[args.algorithm](data, labels, args.n_select, **params)
+
+  scores = getattr(selection, "scores", None) or [None] * len(selection)
+  lines = ["%d" % feature if score is None else "%d\t%.10g" % (feature, score)
+           for feature, score in zip(selection, scores)]
+  out = sys.stdout if args.out is None else open(args.out, "w")
+  try:
+    out.write("\n".join(lines) + "\n")
+  finally:
+    if out is not sys.stdout:
+      out.close()
+  return 0
+
+
+if __name__ == "__main__":
+  sys.exit(_main())
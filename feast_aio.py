@@ -0,0 +1,360 @@
+"""
+  The asyncio interface of feast, available as feast.aio on Python 3.
+
+  Every selector is a coroutine here that runs the selection on a
+  bounded pool of threads, so an event loop, such as that of a web
+  service, stays free while features are selected:
+
+    >>> selection = await feast.aio.JMI(data, labels, 10)
+
+  The coroutines share one L{JobServer}.  A service that wants its own
+  pool, limits and statistics makes a JobServer of its own.
+"""
+import asyncio
+import collections
+import copy
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import feast
+
+# the loop of the coroutine calling, asyncio.get_running_loop is new
+# in Python 3.7
+_running_loop = getattr(asyncio, "get_running_loop", asyncio.get_event_loop)
+
+
+class JobServer(object):
+  """
+    Runs feature selections on a bounded pool of threads for coroutines.
+
+    Identical requests that arrive while the first one is still queued
+    or running are coalesced: they wait for the same selection rather
+    than running it again, and each gets a copy of it.  Requests are identical when they ask the
+    same selector for the same number of features with the same
+    parameters, on arrays with the same contents or on the same data
+    set object.  Requests passing a callback, stop, cache, resume_from
+    or store are never coalesced.
+
+    A request that is cancelled, say because its client went away,
+    stops waiting at once.  Once every request waiting for a selection
+    is cancelled, the selection is dropped if it has not started yet,
+    and otherwise stopped between two greedy steps.  Selections on
+    libFSToolbox run in one call and can only be dropped before they
+    start, and so can selections run by a selector of your own, which
+    is called with the parameters it is given and nothing else.
+
+      >>> server = JobServer(max_workers=4, max_queue=100)
+      >>> selection = await server.select("JMI", data, labels, 10)
+      >>> server.stats()["queued"]
+
+    @ivar max_workers: number of selections run at the same time.
+    @ivar max_queue: number of selections that may wait for a thread,
+      or None for no limit.
+  """
+
+  # number of latencies kept for the statistics
+  _HISTORY = 1000
+
+  def __init__(self, max_workers=None, max_queue=None):
+    """
+      @param max_workers: number of threads, one per CPU by default.
+      @type max_workers: integer
+      @param max_queue: number of selections that may wait for a
+        thread before further requests are refused, or None for no
+        limit.
+      @type max_queue: integer
+    """
+    if max_workers is None:
+      import multiprocessing
+      max_workers = multiprocessing.cpu_count()
+    self.max_workers = max_workers
+    self.max_queue = max_queue
+    self._executor = ThreadPoolExecutor(max_workers=max_workers)
+    self._lock = threading.Lock()
+    self._jobs = {}
+    self._counts = collections.Counter()
+    self._queued = 0
+    self._running = 0
+    self._latencies = dict((name, collections.deque(maxlen=self._HISTORY))
+                           for name in ("wait", "run", "total"))
+
+  async def select(self, algorithm, data, labels, n_select, **params):
+    """
+      Run a selector on the pool and return its selection.
+
+      @param algorithm: the name of a selector, e.g. "JMI", or the
+        selector itself.
+      @param data: the data, as for the selector.
+      @param labels: the labels, as for the selector.
+      @param n_select: number of features to select.
+      @type n_select: integer
+      @param params: keyword arguments of the selector.
+      @return: the selection.
+      @rtype: Selection
+    """
+    selector = feast._selector(algorithm)
+    started = time.time()
+    loop = _running_loop()
+    key = None
+    if _coalescible(params):
+      key = await loop.run_in_executor(None, _job_key, selector, data, labels, n_select, params)
+
+    with self._lock:
+      self._counts["submitted"] += 1
+      job = self._jobs.get(key) if key is not None else None
+      if job is not None:
+        self._counts["coalesced"] += 1
+      else:
+        if self.max_queue is not None and self._queued >= self.max_queue:
+          self._counts["refused"] += 1
+          raise Exception("the job queue is full.")
+        job = _Job(key, selector, data, labels, n_select, params)
+        # raises RuntimeError once the server is closed, before the job
+        # is counted.  The job cannot start before the lock is released.
+        job.future = self._executor.submit(self._run, job)
+        self._queued += 1
+        if key is not None:
+          self._jobs[key] = job
+        job.future.add_done_callback(lambda future, job=job: self._finish(job))
+      job.waiters += 1
+
+    try:
+      selection = await asyncio.shield(asyncio.wrap_future(job.future))
+    except asyncio.CancelledError:
+      with self._lock:
+        self._counts["cancelled"] += 1
+        job.waiters -= 1
+        if job.waiters == 0:
+          job.cancelled.set()
+          if self._jobs.get(job.key) is job:
+            del self._jobs[job.key]
+          if job.future.cancel():
+            self._queued -= 1
+      raise
+    self._record("total", time.time() - started)
+    # coalesced requests share the selection, each gets its own copy
+    return _copy(selection)
+
+  def stats(self):
+    """
+      How busy the server is and how long requests take.
+
+      @return: "queued", the number of selections waiting for a thread,
+        "running" and "in_flight", the number of distinct coalescible
+        selections queued or running.  Counts of the requests
+        "submitted", "coalesced" into one already in flight, "refused"
+        for a full queue, and "cancelled", and of the selections
+        "completed" and "failed".  For "wait" in the queue, "run" on a
+        thread and "total" from request to selection, the "mean",
+        "p50", "p95" and "max" in seconds over the last 1000.
+      @rtype: dict
+    """
+    with self._lock:
+      stats = {"queued": self._queued, "running": self._running, "in_flight": len(self._jobs)}
+      for name in ("submitted", "coalesced", "refused", "cancelled", "completed", "failed"):
+        stats[name] = self._counts[name]
+      latencies = dict((name, sorted(values)) for name, values in self._latencies.items())
+    for name, values in latencies.items():
+      if not values:
+        stats[name] = {"mean": None, "p50": None, "p95": None, "max": None}
+        continue
+      stats[name] = {"mean": sum(values) / len(values),
+                     "p50": values[(len(values) - 1) // 2],
+                     "p95": values[int(0.95 * (len(values) - 1))],
+                     "max": values[-1]}
+    return stats
+
+  def close(self, wait=True):
+    """
+      Stop taking requests and shut the pool down.  Requests made
+      afterwards raise RuntimeError.
+
+      @param wait: True to wait for the selections already running.
+      @type wait: boolean
+    """
+    self._executor.shutdown(wait=wait)
+
+  async def __aenter__(self):
+    return self
+
+  async def __aexit__(self, *exc_info):
+    self.close(wait=False)
+
+  def _run(self, job):
+    """
+      Run the selection of job, on a thread of the pool.
+    """
+    started = time.time()
+    with self._lock:
+      self._queued -= 1
+      self._running += 1
+    self._record("wait", started - job.submitted)
+    try:
+      if job.cancelled.is_set():
+        raise asyncio.CancelledError()
+      return job.selector(job.data, job.labels, job.n_select, **job.params)
+    finally:
+      self._record("run", time.time() - started)
+      with self._lock:
+        self._running -= 1
+
+  def _finish(self, job):
+    """
+      Count a selection that is done and take it out of the jobs in
+      flight.
+    """
+    with self._lock:
+      if self._jobs.get(job.key) is job:
+        del self._jobs[job.key]
+      if not job.future.cancelled() and not job.cancelled.is_set():
+        error = job.future.exception()
+        if error is None:
+          self._counts["completed"] += 1
+        else:
+          self._counts["failed"] += 1
+
+  def _record(self, name, seconds):
+    """
+      Keep a latency for the statistics.
+    """
+    with self._lock:
+      self._latencies[name].append(seconds)
+
+
+class _Job(object):
+  """
+    A selection queued or running on a L{JobServer}, with the number of
+    requests waiting for it.
+  """
+
+  def __init__(self, key, selector, data, labels, n_select, params):
+    self.key = key
+    self.selector = selector
+    self.data = data
+    self.labels = labels
+    self.n_select = n_select
+    self.params = dict(params)
+    self.submitted = time.time()
+    self.waiters = 0
+    self.future = None
+    self.cancelled = threading.Event()
+    builtin = any(job_selector is selector for job_selector in feast._SELECTORS.values())
+    if builtin and "store" not in params and params.get("backend") != "c":
+      # stop between two greedy steps once nobody waits any more
+      callback = self.params.get("callback")
+      def cancel(event):
+        if self.cancelled.is_set():
+          return False
+        return None if callback is None else callback(event)
+      binned = params.get("n_bins") is not None or params.get("binning") is not None
+      if (callback is not None or binned or
+          feast._use_numpy(params.get("backend"), data, labels, **_numpy_options(params))):
+        self.params["callback"] = cancel
+
+
+# parameters with which requests are not coalesced, since they carry
+# state of their own
+_UNIQUE = ("callback", "stop", "cache", "resume_from", "store")
+
+def _coalescible(params):
+  """
+    Whether requests with these parameters may share a selection.
+  """
+  if any(params.get(name) is not None for name in _UNIQUE):
+    return False
+  return all(value is None or isinstance(value, (bool, int, float, str, np.generic)) or
+             (name == "binning" and isinstance(value, (np.ndarray, list, tuple)))
+             for name, value in params.items())
+
+
+def _job_key(selector, data, labels, n_select, params):
+  """
+    A hash of everything a selection depends on.  Arrays are hashed by
+    their contents, data sets by identity.
+  """
+  hasher = hashlib.sha1()
+  # NumPy scalars as Python ones, so that beta=np.float64(0.5) and
+  # beta=0.5 are the same request
+  plain = sorted((name, _plain(value)) for name, value in params.items() if name != "binning")
+  hasher.update(repr((feast.__version__, selector.__module__, selector.__name__,
+                      _plain(n_select), plain)).encode("utf-8"))
+  for value in (data, labels, params.get("binning")):
+    if isinstance(value, (np.ndarray, list, tuple)) or value is None:
+      feast._update_hash(hasher, value)
+    else:
+      hasher.update(("%s@%d;" % (type(value).__name__, id(value))).encode("ascii"))
+  return hasher.hexdigest()
+
+
+def _copy(selection):
+  """
+    A copy of selection that can be changed without changing the
+    selection, with copies of its scores and timings.  The search
+    state is only ever read and is shared.
+  """
+  copied = copy.copy(selection)
+  if isinstance(copied, feast.Selection):
+    copied.scores = list(copied.scores)
+    if copied.timings is not None:
+      copied.timings = dict(copied.timings)
+  return copied
+
+
+def _plain(value):
+  """
+    value, as a Python scalar if it is a NumPy one.
+  """
+  return value.item() if isinstance(value, np.generic) else value
+
+
+def _numpy_options(params):
+  """
+    The parameters that only the NumPy backend implements.
+  """
+  return dict((name, params[name]) for name in feast._NUMPY_OPTIONS if name in params)
+
+
+_server = None
+_server_lock = threading.Lock()
+
+def server():
+  """
+    The L{JobServer} shared by the coroutines of this module, made the
+    first time it is needed.
+
+    @rtype: JobServer
+  """
+  global _server
+  with _server_lock:
+    if _server is None:
+      _server = JobServer()
+    return _server
+
+
+def _coroutine(name):
+  """
+    The coroutine running the selector called name on the shared server.
+  """
+  async def select(data, labels, n_select, **params):
+    return await server().select(name, data, labels, n_select, **params)
+  select.__name__ = name
+  select.__doc__ = """
+    L{feast.%s} as a coroutine, run on the shared L{JobServer}.
+  """ % name
+  return select
+
+BetaGamma = _coroutine("BetaGamma")
+CIFE = _coroutine("CIFE")
+CMIM = _coroutine("CMIM")
+CondMI = _coroutine("CondMI")
+Condred = _coroutine("Condred")
+DISR = _coroutine("DISR")
+ICAP = _coroutine("ICAP")
+JMI = _coroutine("JMI")
+MIFS = _coroutine("MIFS")
+MIM = _coroutine("MIM")
+mRMR = _coroutine("mRMR")
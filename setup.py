@@ -2,5 +2,5 @@ from distutils.core import setup
 
 setup(name='feast',
       version='1.0',
-      py_modules=['feast'],
+      py_modules=['feast', 'feast_aio'],
       )
@@ -0,0 +1,335 @@
+#!/usr/bin/env python
+'''
+	Benchmarks for the feast selectors.
+
+	Every selector is run over a grid of data sizes, numbers of states
+	and densities, on each backend that is available.  Wall time, peak
+	resident memory and the number of mutual information terms computed
+	are written to a JSON file, and two such files can be compared to
+	spot regressions:
+
+		python bench.py --out before.json
+		python bench.py --out after.json
+		python bench.py --compare before.json after.json
+
+	--tolerance adds runs of the approximate search next to the exact
+	ones, and reports how many of the features they agree on and how
+	much faster they are.  Subsets are only used from 131072
+	observations up:
+
+		python bench.py --n-observations 1000000 --tolerance 0.05
+
+	Each case runs in a fresh child process so that its peak memory is
+	its own.
+'''
+from __future__ import print_function
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import feast
+
+
+ALGORITHMS = ['BetaGamma', 'CIFE', 'CMIM', 'CondMI', 'Condred', 'DISR', 'ICAP',
+	'JMI', 'MIFS', 'MIM', 'mRMR']
+
+# the selectors with an approximate search
+APPROXIMATE = ['BetaGamma', 'CIFE', 'Condred', 'DISR', 'JMI', 'MIFS', 'mRMR']
+
+# the axes of the default grid, and of --quick
+GRID = {
+	'n_observations': [1000, 10000],
+	'n_features': [100, 1000],
+	'n_select': [10],
+	'n_states': [3, 256],
+	'density': [1.0, 0.05],
+}
+QUICK = {
+	'n_observations': [1000],
+	'n_features': [100],
+	'n_select': [10],
+	'n_states': [3],
+	'density': [1.0],
+}
+
+# the fields that identify a case between two runs
+KEY = ('algorithm', 'backend', 'n_observations', 'n_features', 'n_select', 'n_states',
+	'density', 'tolerance')
+
+
+def uniform_data(n_observations = 1000, n_features = 50, n_relevant = 5, n_states = 11,
+		seed = 0):
+	'''
+		uniform_data(n_observations, n_features, n_relevant, n_states, seed)
+
+		the data of test.py, drawn from a seeded generator: every feature
+		takes n_states values uniformly, and the label is 1 when the first
+		n_relevant features add up to more than half their range, 2
+		otherwise.
+	'''
+	random = np.random.RandomState(seed)
+	data = 1.0*random.randint(n_states, size = (n_observations, n_features))
+	delta = n_relevant * (n_states - 1) / 2.0
+	labels = np.where(data[:, :n_relevant].sum(axis = 1) > delta, 1.0, 2.0)
+	return np.asfortranarray(data), labels
+
+
+def sparse_data(n_observations = 1000, n_features = 50, density = 0.05, n_relevant = 5,
+		n_states = 11, seed = 0):
+	'''
+		sparse_data(n_observations, n_features, density, n_relevant, n_states, seed)
+
+		count table data: each entry is nonzero with probability density,
+		and nonzero entries take the values 1..n_states-1.  The label is 1
+		when more than a density share of the first n_relevant features
+		are nonzero, 2 otherwise.
+	'''
+	random = np.random.RandomState(seed)
+	data = 1.0*random.randint(1, max(n_states, 2), size = (n_observations, n_features))
+	data[random.rand(n_observations, n_features) >= density] = 0
+	present = (data[:, :n_relevant] > 0).sum(axis = 1)
+	labels = np.where(present > density * n_relevant, 1.0, 2.0)
+	return np.asfortranarray(data), labels
+
+
+def high_cardinality_data(n_observations = 1000, n_features = 50, n_relevant = 5,
+		n_states = 1000, seed = 0):
+	'''
+		high_cardinality_data(n_observations, n_features, n_relevant, n_states, seed)
+
+		features with many states, each feature having its own number of
+		states between 2 and n_states.  The label is 1 when the first
+		n_relevant features, scaled to [0, 1], add up to more than half of
+		n_relevant, 2 otherwise.
+	'''
+	random = np.random.RandomState(seed)
+	cardinality = random.randint(2, n_states + 1, size = n_features)
+	data = np.floor(random.rand(n_observations, n_features) * cardinality)
+	scaled = data[:, :n_relevant] / (cardinality[:n_relevant] - 1)
+	labels = np.where(scaled.sum(axis = 1) > n_relevant / 2.0, 1.0, 2.0)
+	return np.asfortranarray(data), labels
+
+
+def make_data(case):
+	'''
+		the data and labels of a case, and the format they are handed to
+		the selector in.
+	'''
+	shape = (case['n_observations'], case['n_features'])
+	if case['density'] < 1.0:
+		data, labels = sparse_data(*shape, density = case['density'],
+			n_states = case['n_states'], seed = case['seed'])
+		if case['backend'] == 'numpy':
+			try:
+				import scipy.sparse
+			except ImportError:
+				return data, labels, 'dense'
+			return scipy.sparse.csc_matrix(data), labels, 'csc'
+		return data, labels, 'dense'
+	if case['n_states'] > 16:
+		data, labels = high_cardinality_data(*shape, n_states = case['n_states'],
+			seed = case['seed'])
+	else:
+		data, labels = uniform_data(*shape, n_states = case['n_states'], seed = case['seed'])
+	return data, labels, 'dense'
+
+
+def peak_rss():
+	'''
+		peak resident memory of this process in megabytes, or None where
+		the resource module is missing.
+	'''
+	try:
+		import resource
+	except ImportError:
+		return None
+	peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	# kilobytes on Linux, bytes on OS X
+	if sys.platform == 'darwin':
+		return peak / 1048576.0
+	return peak / 1024.0
+
+
+def run_case(case):
+	'''
+		run one case and return it with its measurements.  Runs in a child
+		process of its own.
+	'''
+	data, labels, fmt = make_data(case)
+	selector = getattr(feast, case['algorithm'])
+	result = dict(case)
+	result['format'] = fmt
+	result['rss_before_mb'] = peak_rss()
+	params = {'backend': case['backend']}
+	if case['tolerance'] is not None:
+		params['tolerance'] = case['tolerance']
+	seconds = []
+	for r in range(case['repeat']):
+		started = time.time()
+		selection = selector(data, labels, case['n_select'], **params)
+		seconds.append(time.time() - started)
+	result['seconds'] = min(seconds)
+	result['peak_rss_mb'] = peak_rss()
+	result['evaluations'] = getattr(selection, 'evaluations', None)
+	result['features'] = [int(f) for f in selection]
+	return result
+
+
+def cases(grid, algorithms, backends, repeat, seed, tolerances = ()):
+	'''
+		every combination of the grid, algorithm and backend, and of the
+		tolerances for the selectors with an approximate search on the
+		NumPy backend.
+	'''
+	for n_observations in grid['n_observations']:
+		for n_features in grid['n_features']:
+			for n_select in grid['n_select']:
+				if n_select > n_features:
+					continue
+				for n_states in grid['n_states']:
+					for density in grid['density']:
+						for backend in backends:
+							for algorithm in algorithms:
+								for tolerance in [None] + list(tolerances):
+									if tolerance is not None and (backend != 'numpy' or
+											algorithm not in APPROXIMATE):
+										continue
+									yield {'algorithm': algorithm, 'backend': backend,
+										'n_observations': n_observations, 'n_features': n_features,
+										'n_select': n_select, 'n_states': n_states, 'density': density,
+										'tolerance': tolerance, 'repeat': repeat, 'seed': seed}
+
+
+def run(args):
+	grid = dict(QUICK if args.quick else GRID)
+	for axis in GRID:
+		if getattr(args, axis) is not None:
+			grid[axis] = getattr(args, axis)
+	backends = args.backends
+	if backends is None:
+		backends = ['numpy'] if feast.libFSToolbox is None else ['c', 'numpy']
+
+	results = []
+	for case in cases(grid, args.algorithms, backends, args.repeat, args.seed,
+			args.tolerance or ()):
+		# a fresh process per case keeps the peak memory of one case
+		# out of the next
+		pool = multiprocessing.Pool(1)
+		try:
+			result = pool.apply(run_case, (case,))
+		finally:
+			pool.terminate()
+		results.append(result)
+		print('%-10s %-6s %6d x %-6d k=%-3d states=%-4d density=%-5g tolerance=%-6s %9.3fs %8.1fMB %s'
+			% (result['algorithm'], result['backend'], result['n_observations'],
+			result['n_features'], result['n_select'], result['n_states'], result['density'],
+			result['tolerance'], result['seconds'], result['peak_rss_mb'] or 0,
+			result['evaluations']))
+	agreement(results)
+
+	output = {
+		'meta': {
+			'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+			'python': platform.python_version(),
+			'numpy': np.__version__,
+			'platform': platform.platform(),
+			'feast': feast.__version__,
+			'libFSToolbox': feast.libFSToolbox is not None,
+		},
+		'results': results,
+	}
+	if args.out is not None:
+		with open(args.out, 'w') as f:
+			json.dump(output, f, indent = 1, sort_keys = True)
+
+
+def agreement(results):
+	'''
+		add the speedup of every approximate run over the exact run of
+		the same case, and the share of positions holding the same
+		feature, and print them.
+	'''
+	exact = dict((tuple(r[k] for k in KEY[:-1]), r) for r in results if r['tolerance'] is None)
+	for result in results:
+		if result['tolerance'] is None:
+			continue
+		reference = exact.get(tuple(result[k] for k in KEY[:-1]))
+		if reference is None:
+			continue
+		same = sum(a == b for a, b in zip(result['features'], reference['features']))
+		result['agreement'] = same / float(max(len(reference['features']), 1))
+		result['speedup'] = reference['seconds'] / max(result['seconds'], 1e-9)
+		print('%-10s tolerance=%-6g %6d x %-6d k=%-3d speedup x%-6.2f agreement %.2f' % (
+			result['algorithm'], result['tolerance'], result['n_observations'],
+			result['n_features'], result['n_select'], result['speedup'], result['agreement']))
+
+
+def compare(old_file, new_file, threshold):
+	'''
+		print the ratio of the time and memory of every case found in
+		both files, and return the number of cases that got slower or
+		larger by more than threshold, or that selected other features.
+	'''
+	with open(old_file) as f:
+		old = dict((tuple(r.get(k) for k in KEY), r) for r in json.load(f)['results'])
+	with open(new_file) as f:
+		new = json.load(f)['results']
+
+	regressions = 0
+	for result in new:
+		key = tuple(result.get(k) for k in KEY)
+		if key not in old:
+			continue
+		before = old[key]
+		time_ratio = result['seconds'] / max(before['seconds'], 1e-9)
+		rss_ratio = (result['peak_rss_mb'] or 0) / max(before['peak_rss_mb'] or 0, 1e-9)
+		notes = []
+		if time_ratio > threshold:
+			notes.append('slower')
+		if before['peak_rss_mb'] and rss_ratio > threshold:
+			notes.append('larger')
+		if result['features'] != before['features']:
+			notes.append('features differ')
+		regressions += len(notes) > 0
+		print('%-10s %-6s %6d x %-6d k=%-3d states=%-4d density=%-5g tolerance=%-6s '
+			'time x%-6.2f rss x%-6.2f %s' % (key + (time_ratio, rss_ratio, ', '.join(notes))))
+	return regressions
+
+
+def main():
+	parser = argparse.ArgumentParser(description = 'Benchmark the feast selectors.')
+	parser.add_argument('--out', help = 'write the results to this JSON file')
+	parser.add_argument('--compare', nargs = 2, metavar = ('OLD', 'NEW'),
+		help = 'compare two result files instead of running')
+	parser.add_argument('--threshold', type = float, default = 1.25,
+		help = 'ratio above which --compare reports a regression')
+	parser.add_argument('--quick', action = 'store_true', help = 'run a single small shape')
+	parser.add_argument('--algorithms', nargs = '+', default = ALGORITHMS)
+	parser.add_argument('--backends', nargs = '+', choices = ['c', 'numpy'])
+	parser.add_argument('--repeat', type = int, default = 1,
+		help = 'runs per case, the fastest is kept')
+	parser.add_argument('--seed', type = int, default = 0)
+	parser.add_argument('--tolerance', nargs = '+', type = float,
+		help = 'also run the approximate search with these tolerances')
+	for axis, kind in (('n_observations', int), ('n_features', int), ('n_select', int),
+			('n_states', int), ('density', float)):
+		parser.add_argument('--' + axis.replace('_', '-'), dest = axis, nargs = '+', type = kind)
+	args = parser.parse_args()
+
+	if args.compare:
+		regressions = compare(args.compare[0], args.compare[1], args.threshold)
+		print('%d regression(s)' % regressions)
+		sys.exit(1 if regressions else 0)
+	run(args)
+
+
+if __name__ == '__main__':
+	main()
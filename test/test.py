@@ -1,7 +1,6 @@
 #!/usr/bin/env python 
 from feast import *
 import numpy as np
-import csv
 
 
 def check_result(selected_features, n_relevant):
@@ -21,14 +20,7 @@ def read_digits(fname='digit.txt'):
 		label appended. 
 	'''
 
-	fw = csv.reader(open(fname,'rb'), delimiter='\t')
-	data = []
-	for line in fw: 
-		data.append( [float(x) for x in line] )
-	data = np.array(data, order="F")
-	labels = data[:,len(data.transpose())-1]
-	data = data[:,:len(data.transpose())-1]
-	return data, labels
+	return load_table(fname)
 
 def uniform_data(n_observations = 1000, n_features = 50, n_relevant = 5):
 	import numpy as np
@@ -154,6 +146,303 @@ if check_result(sf, n_relevant) == True:
 else:
 	print '          MIM failed!'
 
+#################################################################
+#################################################################
+if libFSToolbox is not None:
+	print '       Comparing the NumPy backend with libFSToolbox... '
+	for f in [BetaGamma, CMIM, CondMI, DISR, ICAP, JMI, mRMR, MIM]:
+		if f(data, labels, n_select, backend='c') == f(data, labels, n_select, backend='numpy'):
+			print '          ' + f.__name__ + ' matches!'
+		else:
+			print '          ' + f.__name__ + ' does not match!'
+
+#################################################################
+#################################################################
+print '       Running every selector against one MICache... '
+cache = MICache(data, labels)
+success = True
+for f in [BetaGamma, CMIM, CondMI, DISR, ICAP, JMI, mRMR, MIM]:
+	if f(data, labels, n_select, backend='numpy') != f(data, labels, n_select, cache=cache):
+		success = False
+if success == True:
+	print '          MICache passed! (' + str(cache.misses) + ' computed, ' + str(cache.hits) + ' reused)'
+else:
+	print '          MICache failed!'
+
+#################################################################
+#################################################################
+print '       Running BetaGammaSweep... '
+grid = [0.0, 0.5, 1.0]
+sweep = BetaGammaSweep(data, labels, n_select, grid, grid)
+success = True
+for beta in grid:
+	for gamma in grid:
+		if sweep[(beta, gamma)] != BetaGamma(data, labels, n_select, beta=beta, gamma=gamma, backend='numpy'):
+			success = False
+if success == True:
+	print '          BetaGammaSweep passed!'
+else:
+	print '          BetaGammaSweep failed!'
+
+#################################################################
+#################################################################
+print '       Running JMI on uint8 states... '
+if JMI(np.asfortranarray(data.astype(np.uint8)), labels.astype(np.uint8), n_select) == JMI(data, labels, n_select, backend='numpy'):
+	print '          uint8 JMI passed!'
+else:
+	print '          uint8 JMI failed!'
+
+#################################################################
+#################################################################
+print '       Running mRMR on a DiscretizedDataset... '
+dataset = DiscretizedDataset(data, labels)
+if mRMR(dataset, None, n_select) == mRMR(data, labels, n_select, backend='numpy'):
+	print '          DiscretizedDataset passed!'
+else:
+	print '          DiscretizedDataset failed!'
+
+#################################################################
+#################################################################
+print '       Running JMI on a ChunkedDataset... '
+chunked = ChunkedDataset(data, labels, chunk_size=128)
+passes = []
+def chunks():
+	passes.append(1)
+	return iter([data[:256], data[256:]])
+streamed = ChunkedDataset(chunks, labels)
+before = len(passes)
+try:
+	CondMI(streamed, None, n_select)
+	refused = False
+except Exception:
+	refused = len(passes) == before
+if JMI(chunked, None, n_select) == JMI(data, labels, n_select, backend='numpy') and refused:
+	print '          ChunkedDataset passed!'
+else:
+	print '          ChunkedDataset failed!'
+
+#################################################################
+#################################################################
+print '       Running select_many... '
+names = ['BetaGamma', 'CMIM', 'CondMI', 'DISR', 'ICAP', 'JMI', 'mRMR', 'MIM']
+results = select_many([(name, data, labels, n_select) for name in names], max_workers=4)
+if results == [globals()[name](data, labels, n_select) for name in names]:
+	print '          select_many passed!'
+else:
+	print '          select_many failed!'
+
+#################################################################
+#################################################################
+print '       Running CMIM with n_jobs=4... '
+if CMIM(data, labels, n_select, n_jobs=4) == CMIM(data, labels, n_select, backend='numpy'):
+	print '          n_jobs passed!'
+else:
+	print '          n_jobs failed!'
+
+#################################################################
+#################################################################
+print '       Running JMI with resume_from... '
+first = JMI(data, labels, n_select / 2, backend='numpy')
+if JMI(data, labels, n_select, resume_from=first) == JMI(data, labels, n_select, backend='numpy'):
+	print '          resume_from passed!'
+else:
+	print '          resume_from failed!'
+
+#################################################################
+#################################################################
+print '       Running JMI with an EarlyStop... '
+full = JMI(data, labels, n_select, backend='numpy')
+gain = min(full.scores[:n_select / 2])
+early = JMI(data, labels, n_select, stop=EarlyStop(min_gain=gain))
+if early == full[:len(early)] and len(early) >= n_select / 2:
+	print '          EarlyStop passed!'
+else:
+	print '          EarlyStop failed!'
+
+#################################################################
+#################################################################
+print '       Running stability_select... '
+dataset = DiscretizedDataset(data, labels)
+rows = np.arange(len(labels)) % (len(labels) / 2)
+weights = np.bincount(rows, minlength=len(labels))
+result = stability_select('JMI', data, labels, n_select, n_resamples=5, n_jobs=2, seed=0)
+if (JMI(dataset.resample(weights), None, n_select) == JMI(data[rows], labels[rows], n_select, backend='numpy')
+		and round(result['frequency'].sum()) == n_select):
+	passed = True
+	for unsupported in (chunked, ShardedDataset([(data, labels)]), MICache(dataset, None)):
+		try:
+			stability_select('JMI', unsupported, None, n_select, n_resamples=2)
+			passed = False
+		except Exception as error:
+			passed = passed and str(error) == 'stability_select needs the data in memory.'
+else:
+	passed = False
+if passed:
+	print '          stability_select passed!'
+else:
+	print '          stability_select failed!'
+
+#################################################################
+#################################################################
+print '       Running JMI on sparse data... '
+try:
+	import scipy.sparse
+except ImportError:
+	print '          scipy is not installed, skipped'
+else:
+	sparse = scipy.sparse.csc_matrix(np.where(data > 0.5, data, 0))
+	if JMI(sparse, labels, n_select) == JMI(sparse.toarray(), labels, n_select, backend='numpy'):
+		print '          sparse data passed!'
+	else:
+		print '          sparse data failed!'
+
+#################################################################
+#################################################################
+print '       Running fast CMIM... '
+selection = CMIM(data, labels, n_select, fast=True)
+if selection == CMIM(data, labels, n_select, backend='numpy') and selection.skipped >= 0:
+	print '          fast CMIM passed!'
+else:
+	print '          fast CMIM failed!'
+
+#################################################################
+#################################################################
+print '       Running select with a MIM prefilter... '
+survivors = np.sort(MIM(data, labels, 2 * n_select, backend='numpy')).astype(int)
+selection = select(data, labels, n_select, algorithm='JMI', prefilter_k=2 * n_select)
+expected = [float(survivors[int(f)]) for f in JMI(data[:, survivors], labels, n_select, backend='numpy')]
+if selection == expected and sorted(selection.timings) == ['encode', 'prefilter', 'select']:
+	print '          select passed!'
+else:
+	print '          select failed!'
+
+#################################################################
+#################################################################
+print '       Running JMI with a callback... '
+events = []
+selection = JMI(data, labels, n_select, callback=events.append)
+if [event['feature'] for event in events] == selection and 'convert' in selection.timings:
+	print '          callback passed!'
+else:
+	print '          callback failed!'
+
+#################################################################
+#################################################################
+print '       Running cv_select... '
+folds = np.array_split(np.arange(len(labels)), 3)
+selections = cv_select('JMI', data, labels, n_select, folds=3, n_jobs=2)
+expected = [JMI(np.delete(data, fold, axis=0), np.delete(labels, fold), n_select, backend='numpy')
+	for fold in folds]
+if selections == expected:
+	print '          cv_select passed!'
+else:
+	print '          cv_select failed!'
+
+#################################################################
+#################################################################
+print '       Running JMI with a ResultStore... '
+import shutil, tempfile
+directory = tempfile.mkdtemp()
+try:
+	store = ResultStore(directory)
+	selection = JMI(data, labels, n_select, store=store)
+	prefix = JMI(data, labels, n_select - 2, store=store)
+	# the labels are feature 0, nothing is left to select after it
+	exhausted = CondMI(data, data[:, 0], 3, store=store)
+	longer = CondMI(data, data[:, 0], n_select, store=store)
+	if (selection == JMI(data, labels, n_select) and prefix == selection[:n_select - 2]
+			and longer == CondMI(data, data[:, 0], n_select, backend='numpy')
+			and exhausted == [0, -1, -1] and (store.hits, store.misses) == (2, 2)):
+		print '          ResultStore passed!'
+	else:
+		print '          ResultStore failed!'
+finally:
+	shutil.rmtree(directory)
+
+#################################################################
+#################################################################
+print '       Running the approximate JMI... '
+random = np.random.RandomState(0)
+big = random.randint(0, 3, (150000, 20))
+big[:, 1] = np.where(random.rand(150000) < 0.3, random.randint(0, 3, 150000), big[:, 0])
+big_labels = (big[:, 0] + big[:, 2] + random.randint(0, 2, 150000)) % 3
+selection = JMI(big, big_labels, 5, tolerance=0.05)
+if selection == JMI(big, big_labels, 5):
+	print '          approximate JMI passed!'
+else:
+	print '          approximate JMI failed!'
+
+#################################################################
+#################################################################
+print '       Running JMI on a ShardedDataset... '
+shards = [(data[:200], labels[:200]), (data[200:], labels[200:])]
+sharded = ShardedDataset(shards)
+if JMI(sharded, None, n_select) == JMI(data, labels, n_select, backend='numpy'):
+	print '          ShardedDataset passed!'
+else:
+	print '          ShardedDataset failed!'
+
+#################################################################
+#################################################################
+print '       Running select_batch... '
+groups = np.array([data[:100], data[100:200]])
+group_labels = np.array([labels[:100], labels[100:200]])
+selected = select_batch('JMI', groups, group_labels, n_select)
+first_steps = lambda event: event['step'] < 2
+stopped = select_batch('JMI', groups, group_labels, n_select, callback=first_steps)
+if ((selected == [JMI(groups[i], group_labels[i], n_select) for i in range(2)]).all()
+		and (stopped[:, :3] == selected[:, :3]).all() and (stopped[:, 3:] == -1).all()):
+	print '          select_batch passed!'
+else:
+	print '          select_batch failed!'
+
+#################################################################
+#################################################################
+print '       Running load_table... '
+digits = np.loadtxt('digit.txt')
+table, table_labels = read_digits('digit.txt')
+if (table == digits[:, :-1]).all() and (table_labels == digits[:, -1]).all():
+	print '          load_table passed!'
+else:
+	print '          load_table failed!'
+
+#################################################################
+#################################################################
+print '       Running DISR and JMI with a min_ratio... '
+passed = True
+for selector in (DISR, JMI):
+	full = selector(table, table_labels, n_select, backend='numpy')
+	expected = [i for i in range(2, n_select) if full.scores[i] < 0.95 * full.scores[1]][0]
+	early = selector(table, table_labels, n_select, stop=EarlyStop(min_ratio=0.95))
+	passed = passed and early == full[:expected] and 2 < expected < n_select
+if passed:
+	print '          min_ratio passed!'
+else:
+	print '          min_ratio failed!'
+
+#################################################################
+#################################################################
+print '       Running JMI on continuous data... '
+continuous = data + np.random.rand(*data.shape)
+if JMI(continuous, labels, n_select, n_bins=11, binning=np.arange(1, 11)) == JMI(data, labels, n_select):
+	print '          discretize passed!'
+else:
+	print '          discretize failed!'
+
+#################################################################
+#################################################################
+print '       Running JMI and mRMR on 2-D labels... '
+targets = np.column_stack((labels, labels[::-1]))
+passed = True
+for selector in (JMI, mRMR):
+	selections = selector(data, targets, n_select, n_jobs=2)
+	passed &= selections == [selector(data, labels, n_select, backend='numpy'),
+		selector(data, labels[::-1], n_select, backend='numpy')]
+if passed:
+	print '          2-D labels passed!'
+else:
+	print '          2-D labels failed!'
+
 print '---> Done unit tests!'
 
 
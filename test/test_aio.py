@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# Tests of feast.aio, which needs Python 3, unlike test.py.
+import asyncio
+import threading
+
+import numpy as np
+
+import feast
+from feast_aio import JobServer
+
+
+def wait_for(server, **counts):
+	'''
+		wait_for(server, **counts)
+
+		wait until the statistics of server show all of the counts given.
+	'''
+	async def wait():
+		while any(server.stats()[name] != count for name, count in counts.items()):
+			await asyncio.sleep(0.01)
+	return asyncio.wait_for(wait(), 10)
+
+
+def blocking(release):
+	'''
+		blocking(release)
+
+		a selector of our own that holds its thread until release is set.
+	'''
+	def blocker(data, labels, n_select, **params):
+		release.wait()
+		return []
+	return blocker
+
+
+np.random.seed(0)
+data = np.random.randint(3, size=(500, 30))
+labels = np.random.randint(2, size=500)
+n_select = 10
+
+print('---> Starting feast.aio tests...')
+
+#################################################################
+#################################################################
+async def coalescing():
+	release = threading.Event()
+	async with JobServer(max_workers=1) as server:
+		try:
+			blocked = asyncio.ensure_future(server.select(blocking(release), data, labels, 1))
+			await wait_for(server, running=1)
+			requests = asyncio.gather(server.select('JMI', data, labels, n_select),
+			                          server.select('JMI', data, labels, np.int64(n_select)))
+			await wait_for(server, submitted=3)
+		finally:
+			release.set()
+		first, second = await requests
+		await blocked
+		await wait_for(server, completed=2)
+		stats = server.stats()
+	return (first == second == feast.JMI(data, labels, n_select, backend='numpy')
+	        and first is not second and first.scores is not second.scores
+	        and stats['coalesced'] == 1 and stats['in_flight'] == 0 and stats['queued'] == 0)
+
+print('       Running JMI twice at once... ')
+if asyncio.run(coalescing()):
+	print('          coalescing passed!')
+else:
+	print('          coalescing failed!')
+
+#################################################################
+#################################################################
+async def cancelling():
+	started, go = threading.Event(), threading.Event()
+	steps = []
+	def callback(event):
+		steps.append(event['step'])
+		started.set()
+		go.wait()
+	async with JobServer(max_workers=1) as server:
+		try:
+			task = asyncio.ensure_future(server.select('JMI', data, labels, n_select, callback=callback))
+			while not started.is_set():
+				await asyncio.sleep(0.01)
+			task.cancel()
+			try:
+				await task
+				cancelled = False
+			except asyncio.CancelledError:
+				cancelled = True
+		finally:
+			go.set()
+		await wait_for(server, running=0)
+		stats = server.stats()
+	return (cancelled and steps == [0] and stats['cancelled'] == 1
+	        and stats['completed'] == 0 and stats['failed'] == 0)
+
+print('       Cancelling JMI mid-run... ')
+if asyncio.run(cancelling()):
+	print('          cancelling passed!')
+else:
+	print('          cancelling failed!')
+
+#################################################################
+#################################################################
+async def refusing():
+	release = threading.Event()
+	async with JobServer(max_workers=1, max_queue=1) as server:
+		try:
+			blocked = asyncio.ensure_future(server.select(blocking(release), data, labels, 1))
+			await wait_for(server, running=1)
+			queued = asyncio.ensure_future(server.select('MIM', data, labels, n_select))
+			await wait_for(server, queued=1)
+			try:
+				await server.select('JMI', data, labels, n_select)
+				refused = False
+			except Exception as error:
+				refused = str(error) == 'the job queue is full.'
+		finally:
+			release.set()
+		await blocked
+		await queued
+		await wait_for(server, completed=2)
+		stats = server.stats()
+	return (refused and stats['refused'] == 1 and stats['submitted'] == 3
+	        and stats['wait']['max'] is not None and stats['total']['p50'] is not None)
+
+print('       Running JMI on a full queue... ')
+if asyncio.run(refusing()):
+	print('          max_queue passed!')
+else:
+	print('          max_queue failed!')
+
+#################################################################
+#################################################################
+async def closing():
+	server = JobServer(max_workers=1)
+	server.close()
+	try:
+		await server.select('JMI', data, labels, n_select)
+		return False
+	except RuntimeError:
+		stats = server.stats()
+		return stats['queued'] == 0 and stats['in_flight'] == 0
+
+print('       Running JMI on a closed server... ')
+if asyncio.run(closing()):
+	print('          close passed!')
+else:
+	print('          close failed!')
+
+print('---> Done feast.aio tests!')